@@ -0,0 +1,116 @@
+import datetime
+import threading
+import weakref
+from collections import OrderedDict
+import pandas as pd
+from period_rollup import frame_fingerprint
+
+# Quantidade de artefatos (DataFrames derivados, gráficos) mantidos em memória
+ARTIFACT_CACHE_SIZE = 128
+
+# Impressões digitais já calculadas, por id do DataFrame (descartadas quando ele é coletado)
+_frame_fingerprints = {}
+_fingerprint_lock = threading.Lock()
+
+
+def _frame_key(df: pd.DataFrame):
+    """
+    Impressão digital do conteúdo de um DataFrame, calculada uma vez por objeto: resultados
+    do cache de relatórios e do próprio grafo são os mesmos objetos entre reruns.
+    """
+    key = id(df)
+    with _fingerprint_lock:
+        entry = _frame_fingerprints.get(key)
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+    fingerprint = ('frame', frame_fingerprint(df))
+    with _fingerprint_lock:
+        _frame_fingerprints[key] = (
+            weakref.ref(df, lambda _, key=key: _frame_fingerprints.pop(key, None)),
+            fingerprint,
+        )
+    return fingerprint
+
+
+def fingerprint(value, refs):
+    """
+    Chave de memorização de um valor: conteúdo para DataFrames, valor para escalares e
+    datas, recursiva para tuplas, listas e dicts e identidade para os demais objetos
+    (que ficam em `refs`, presos à entrada, para que o id não seja reaproveitado).
+    """
+    if isinstance(value, pd.DataFrame):
+        return _frame_key(value)
+    if isinstance(value, (tuple, list)):
+        return (type(value).__name__, tuple(fingerprint(item, refs) for item in value))
+    if isinstance(value, dict):
+        return ('dict', tuple(sorted((k, fingerprint(v, refs)) for k, v in value.items())))
+    if value is None or isinstance(value, (str, int, float, bool, datetime.date)):
+        return value
+    refs.append(value)
+    return ('id', id(value))
+
+
+class ArtifactGraph:
+    """
+    Memoriza artefatos derivados (rollups, rankings, gráficos Altair) pela impressão digital
+    das suas entradas. Como cada resultado é o mesmo objeto enquanto as entradas não mudam,
+    ele serve de entrada para o próximo nó sem novo cálculo: dado bruto -> derivados -> gráficos.
+    Um rerun que não muda os dados não refaz nenhum trabalho de pandas ou Altair.
+
+    Os artefatos são compartilhados entre sessões: quem os recebe não deve alterá-los.
+    """
+
+    def __init__(self, max_entries=ARTIFACT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def derive(self, fn, *args, **kwargs):
+        """
+        Retorna `fn(*args, **kwargs)`, reaproveitando o resultado anterior para as mesmas entradas.
+        Métodos de instância também entram na chave pela instância (`fn.__self__`).
+        """
+        refs = []
+        key = (
+            fn.__module__,
+            fn.__qualname__,
+            fingerprint(getattr(fn, '__self__', None), refs),
+            fingerprint(args, refs),
+            fingerprint(kwargs, refs),
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[0]
+            self._stats['misses'] += 1
+
+        value = fn(*args, **kwargs)
+        with self._lock:
+            self._entries[key] = (value, refs)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Acertos, faltas e artefatos em memória.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+
+_artifact_graph = ArtifactGraph()
+
+
+def get_artifact_graph():
+    return _artifact_graph
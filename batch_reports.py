@@ -0,0 +1,153 @@
+import os
+import argparse
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from get_club_data import get_club_data
+from read_sales_items_report_by_user import read_sales_items_report_by_user
+from read_sale_items_not_buffet import read_sale_items_not_buffet
+from create_club_chart import create_club_chart, create_ranking_chart
+from create_sales_chart_by_user import create_sales_chart_by_user
+from create_sale_items_chart import create_sale_items_chart
+from prefix_index import prefix_index_for
+from report_queries import DEFAULT_STORE_IDS
+
+# Formatos gerados por padrão: especificação Vega-Lite, página HTML e tabelas Parquet
+DEFAULT_FORMATS = ("json", "html", "parquet")
+
+# Processos em paralelo; cada um abre seu próprio pool de conexões
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def split_periods(start_date, end_date, granularity):
+    """
+    Divide [start_date, end_date] em semanas ISO (segunda a domingo) ou meses de calendário,
+    cortando o primeiro e o último período nos limites informados.
+
+    Returns:
+        list[tuple[datetime.date, datetime.date]]: Início e fim (inclusivos) de cada período.
+    """
+    if granularity == "week":
+        first = start_date - datetime.timedelta(days=start_date.weekday())
+        starts = pd.date_range(first, end_date, freq="7D").date
+    else:
+        starts = pd.date_range(start_date.replace(day=1), end_date, freq="MS").date
+    periods = []
+    for period_start, next_start in zip(starts, list(starts[1:]) + [end_date + datetime.timedelta(days=1)]):
+        periods.append((max(period_start, start_date), min(next_start - datetime.timedelta(days=1), end_date)))
+    return periods
+
+
+def last_complete_week(today=None):
+    """
+    Returns:
+        tuple[datetime.date, datetime.date]: Segunda e domingo da última semana encerrada.
+    """
+    today = today or datetime.date.today()
+    end = today - datetime.timedelta(days=today.weekday() + 1)
+    return end - datetime.timedelta(days=6), end
+
+
+def build_store_period(store_id, start_date, end_date, out_dir, formats=DEFAULT_FORMATS):
+    """
+    Gera os gráficos e tabelas de uma loja em um período, em `out_dir/<loja>/<início>_<fim>/`.
+
+    Returns:
+        dict: Loja, período, linhas lidas e arquivos gravados.
+    """
+    target = os.path.join(out_dir, str(store_id), f"{start_date.isoformat()}_{end_date.isoformat()}")
+    os.makedirs(target, exist_ok=True)
+
+    df_club = get_club_data(start_date, end_date, [store_id])
+    df_items_user, _ = read_sales_items_report_by_user(start_date, end_date, [store_id])
+    df_items = read_sale_items_not_buffet(start_date, end_date, [store_id])
+
+    tables = {
+        "club_data": df_club,
+        "sales_items_by_user": df_items_user,
+        "sale_items_not_buffet": df_items,
+    }
+    charts = {}
+    if not df_club.empty:
+        club_index = prefix_index_for(
+            df_club, 'Data da Venda', ['Loja', 'Vendedor'], ['Qtd. CPF Clube (Dia)', 'Vendas Totais (Dia)']
+        )
+        charts["ranking_chart"] = create_ranking_chart(club_index.ratio(
+            start_date, end_date, 'Qtd. CPF Clube (Dia)', 'Vendas Totais (Dia)', '% CPF Clube (Acumulado)',
+            by=['Vendedor']
+        ))
+        charts["club_chart"] = create_club_chart(df_club)
+    if not df_items_user.empty:
+        charts["sales_chart_by_user"] = create_sales_chart_by_user(df_items_user)
+    if not df_items.empty:
+        charts["sale_items_chart"] = create_sale_items_chart(df_items)
+
+    files = []
+    for name, chart in charts.items():
+        for fmt in ("json", "html"):
+            if fmt in formats:
+                path = os.path.join(target, f"{name}.{fmt}")
+                chart.save(path)
+                files.append(path)
+    if "parquet" in formats:
+        for name, df in tables.items():
+            path = os.path.join(target, f"{name}.parquet")
+            df.to_parquet(path, index=False)
+            files.append(path)
+
+    return {
+        "loja": store_id,
+        "inicio": start_date,
+        "fim": end_date,
+        "linhas": sum(len(df) for df in tables.values()),
+        "arquivos": len(files),
+    }
+
+
+def run_batch(store_ids, periods, out_dir, formats=DEFAULT_FORMATS, workers=DEFAULT_WORKERS):
+    """
+    Gera os relatórios de cada (loja, período) em paralelo, em processos separados.
+
+    Returns:
+        pd.DataFrame: Um resumo por (loja, período); falhas aparecem com a coluna 'erro'.
+    """
+    tasks = [(store_id, start, end) for store_id in store_ids for start, end in periods]
+    results = []
+    # spawn: cada processo começa limpo, sem herdar conexões ou threads do processo principal
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {
+            executor.submit(build_store_period, store_id, start, end, out_dir, formats): (store_id, start, end)
+            for store_id, start, end in tasks
+        }
+        for future in as_completed(futures):
+            store_id, start, end = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as exc:
+                results.append({"loja": store_id, "inicio": start, "fim": end, "erro": repr(exc)})
+            print(f"[{len(results)}/{len(tasks)}] loja {store_id} {start} .. {end}", flush=True)
+    return pd.DataFrame(results).sort_values(["loja", "inicio"]).reset_index(drop=True)
+
+
+def main():
+    default_start, default_end = last_complete_week()
+    parser = argparse.ArgumentParser(description="Gera os gráficos e tabelas dos relatórios sem abrir o app.")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, default=default_start, help="Data inicial (AAAA-MM-DD); padrão: última semana encerrada.")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=default_end, help="Data final (AAAA-MM-DD).")
+    parser.add_argument("--granularity", choices=["week", "month"], default="week", help="Um relatório por semana ISO ou por mês.")
+    parser.add_argument("--stores", type=lambda value: [int(store) for store in value.split(",")], default=list(DEFAULT_STORE_IDS), help="Lojas separadas por vírgula; padrão: CLUB_STORE_IDS.")
+    parser.add_argument("--formats", type=lambda value: tuple(value.split(",")), default=DEFAULT_FORMATS, help="Subconjunto de json,html,parquet.")
+    parser.add_argument("--out", default="reports", help="Diretório de saída.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Processos em paralelo.")
+    args = parser.parse_args()
+
+    periods = split_periods(args.start, args.end, args.granularity)
+    summary = run_batch(args.stores, periods, args.out, args.formats, args.workers)
+    print(summary.to_string(index=False))
+    if "erro" in summary.columns and summary["erro"].notna().any():
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
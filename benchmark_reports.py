@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import argparse
+import datetime
+import tempfile
+import numpy as np
+import pandas as pd
+import daily_store
+import instrumentation
+from get_club_data import get_club_data
+from read_sales_items_report_by_user import read_sales_items_report_by_user
+from read_sale_items_not_buffet import read_sale_items_not_buffet
+from sale_facts import read_sale_facts
+from report_queries import DEFAULT_STORE_IDS
+
+# Leitores medidos de ponta a ponta (SQL, leitura do resultado e pandas), sem o cache de relatórios.
+# read_sale_facts é a leitura da tela de atendentes no caminho padrão (sem agregados diários)
+BENCHMARKS = {
+    'get_club_data': get_club_data,
+    'read_sales_items_report_by_user': read_sales_items_report_by_user,
+    'read_sale_items_not_buffet': read_sale_items_not_buffet,
+    'read_sale_facts': read_sale_facts,
+}
+
+# Arquivo padrão da linha de base
+DEFAULT_BASELINE_PATH = os.path.join(".cache", "benchmark_baseline.json")
+
+# Aumento tolerado da mediana antes de acusar regressão (0.2 = 20%)
+DEFAULT_TOLERANCE = 0.2
+
+
+def _run_once(name, reader, start_date, end_date, store_ids):
+    """
+    Executa o leitor uma vez, com o armazenamento diário local vazio (o get_club_data
+    busca tudo no Postgres), e retorna o tempo total e o tempo por etapa.
+    """
+    store_path = daily_store.DAILY_STORE_PATH
+    with tempfile.TemporaryDirectory() as directory:
+        daily_store.DAILY_STORE_PATH = os.path.join(directory, "club_daily.sqlite3")
+        try:
+            instrumentation.start_run()
+            started = time.perf_counter()
+            with instrumentation.report_span(name):
+                reader(start_date, end_date, store_ids)
+            total = time.perf_counter() - started
+            events = instrumentation.finish_run()
+        finally:
+            daily_store.DAILY_STORE_PATH = store_path
+    by_kind = events.groupby('kind')['duration_s'].sum() if not events.empty else pd.Series(dtype=float)
+    return {
+        'total_s': total,
+        'sql_s': float(by_kind.get('sql', 0.0)),
+        'pandas_s': float(by_kind.get('pandas', 0.0)),
+    }
+
+
+def run_benchmarks(start_date, end_date, store_ids, repeat=5, names=None):
+    """
+    Mede cada leitor `repeat` vezes (mais uma execução de aquecimento, descartada).
+
+    Returns:
+        pd.DataFrame: Por leitor: mediana e p95 do total, medianas de SQL e pandas.
+    """
+    rows = []
+    for name in names or BENCHMARKS:
+        reader = BENCHMARKS[name]
+        _run_once(name, reader, start_date, end_date, store_ids)
+        runs = pd.DataFrame([_run_once(name, reader, start_date, end_date, store_ids) for _ in range(repeat)])
+        rows.append({
+            'benchmark': name,
+            'median_s': float(runs['total_s'].median()),
+            'p95_s': float(np.percentile(runs['total_s'], 95)),
+            'sql_median_s': float(runs['sql_s'].median()),
+            'pandas_median_s': float(runs['pandas_s'].median()),
+        })
+    return pd.DataFrame(rows)
+
+
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compara as medianas com a linha de base.
+
+    Returns:
+        pd.DataFrame: Resultados com 'baseline_s', 'variacao' e 'regressao' (mediana acima da tolerância).
+    """
+    df = results.copy()
+    df['baseline_s'] = df['benchmark'].map(lambda name: baseline.get(name, {}).get('median_s'))
+    df['variacao'] = (df['median_s'] / df['baseline_s'] - 1).round(3)
+    df['regressao'] = df['variacao'] > tolerance
+    return df
+
+
+def main():
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    parser = argparse.ArgumentParser(description="Mede os leitores dos relatórios e compara com uma linha de base.")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, default=yesterday - datetime.timedelta(days=30), help="Data inicial (AAAA-MM-DD).")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=yesterday, help="Data final (AAAA-MM-DD).")
+    parser.add_argument("--stores", type=lambda value: [int(store) for store in value.split(",")], default=list(DEFAULT_STORE_IDS), help="Lojas separadas por vírgula.")
+    parser.add_argument("--repeat", type=int, default=5, help="Execuções medidas por leitor.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Mede apenas estes leitores.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Arquivo JSON da linha de base.")
+    parser.add_argument("--save-baseline", action="store_true", help="Grava os resultados como nova linha de base.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Aumento tolerado da mediana (0.2 = 20%%).")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.start, args.end, args.stores, args.repeat, args.only)
+
+    if args.save_baseline:
+        directory = os.path.dirname(args.baseline)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({row['benchmark']: row for row in results.to_dict('records')}, f, indent=2)
+        print(results.to_string(index=False))
+        print(f"Linha de base gravada em {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(results.to_string(index=False))
+        print(f"Sem linha de base em {args.baseline}: rode com --save-baseline para criar uma.")
+        return
+
+    with open(args.baseline) as f:
+        compared = compare_with_baseline(results, json.load(f), args.tolerance)
+    print(compared.to_string(index=False))
+    if compared['regressao'].any():
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
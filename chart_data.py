@@ -0,0 +1,53 @@
+import datetime
+import pandas as pd
+
+# Máximo de pontos por série enviados ao navegador em gráficos de linha
+MAX_POINTS_PER_SERIES = 60
+
+
+def project(df: pd.DataFrame, columns) -> pd.DataFrame:
+    """
+    Mantém apenas as colunas usadas nas codificações do gráfico, para que
+    o restante do DataFrame não seja serializado na especificação Vega-Lite.
+    Colunas de `datetime.date` viram datetime64, que o Altair serializa diretamente, e as
+    categóricas (nomes de vendedores) viram texto, para continuarem codificadas como nominais.
+    """
+    df = df.loc[:, list(columns)].copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+        elif df[col].dtype == object and not df.empty and isinstance(df[col].iloc[0], datetime.date):
+            df[col] = pd.to_datetime(df[col])
+    return df
+
+
+def downsample_series(df: pd.DataFrame, x: str, series: str, max_points=MAX_POINTS_PER_SERIES) -> pd.DataFrame:
+    """
+    Limita a quantidade de pontos por série dividindo o eixo de datas em `max_points`
+    faixas iguais e mantendo o último ponto de cada faixa. Para métricas acumuladas
+    isso preserva o valor ao fim de cada faixa, inclusive o valor final de cada série.
+
+    Args:
+        df (pd.DataFrame): Dados já projetados.
+        x (str): Coluna de data do eixo X.
+        series (str): Coluna que identifica a série (ex.: vendedor).
+        max_points (int): Máximo de pontos por série.
+
+    Returns:
+        pd.DataFrame: O próprio DataFrame, se já couber no limite, ou a versão reduzida.
+    """
+    if df.empty or df.groupby(series, observed=True).size().max() <= max_points:
+        return df
+
+    dates = pd.to_datetime(df[x])
+    start, span = dates.min(), (dates.max() - dates.min()) + pd.Timedelta(days=1)
+    buckets = ((dates - start) / span * max_points).astype(int)
+
+    last_in_bucket = (
+        df.assign(_faixa=buckets, _data=dates)
+        .sort_values('_data', kind='stable')
+        .groupby([series, '_faixa'], sort=False, observed=True)
+        .tail(1)
+        .index
+    )
+    return df.loc[last_in_bucket]
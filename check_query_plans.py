@@ -0,0 +1,75 @@
+import sys
+import datetime
+from get_connection import get_report_connection
+from daily_store import DELTA_QUERY
+from read_sales_items_report_by_user import SALES_ITEMS_REPORT_QUERY
+from read_sale_items_not_buffet import SALE_ITEMS_NOT_BUFFET_QUERY
+from sale_facts import SALE_FACTS_QUERY
+from report_queries import report_filters, sale_date_predicate, sale_date_params
+from user_directory import excluded_seller_ids
+
+# Tabelas que nunca devem ser lidas por inteiro pelas consultas de relatório
+GUARDED_TABLES = {'sales', 'sale_items', 'cash_history'}
+
+
+def report_queries(start_date, end_date):
+    """
+    Retorna (nome, consulta, parâmetros) de cada consulta de relatório para o período.
+    """
+    store_ids, excluded_sellers = report_filters()
+    params = sale_date_params(start_date, end_date)
+    return [
+        ('get_club_data', DELTA_QUERY.format(periodos=f"({sale_date_predicate()})"), (store_ids, *params)),
+        ('read_sales_items_report_by_user', SALES_ITEMS_REPORT_QUERY, (store_ids, *params, excluded_seller_ids(excluded_sellers))),
+        ('read_sale_items_not_buffet', SALE_ITEMS_NOT_BUFFET_QUERY, (store_ids, *params, [])),
+        ('read_sale_facts', SALE_FACTS_QUERY, (store_ids, *params)),
+    ]
+
+
+def find_seq_scans(plan):
+    """
+    Percorre o plano (EXPLAIN FORMAT JSON) e retorna as tabelas protegidas lidas por Seq Scan.
+    """
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name', '').lower() in GUARDED_TABLES:
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found.extend(find_seq_scans(child))
+    return found
+
+
+def check_query_plans(start_date, end_date):
+    """
+    Roda EXPLAIN de cada consulta de relatório e retorna as que caem em Seq Scan.
+
+    O Seq Scan é desabilitado na sessão, de forma que o planejador só o escolha
+    quando não existir um índice utilizável; assim a checagem não depende do
+    tamanho das tabelas no banco em que roda.
+
+    Returns:
+        dict[str, list[str]]: Tabelas lidas por Seq Scan, por consulta.
+    """
+    failures = {}
+    with get_report_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            for name, query, params in report_queries(start_date, end_date):
+                cursor.execute("EXPLAIN (FORMAT JSON) " + query.strip().rstrip(';'), params)
+                row = cursor.fetchone()
+                plan = list(row.values())[0][0]['Plan']
+                tables = find_seq_scans(plan)
+                if tables:
+                    failures[name] = tables
+        conn.rollback()
+    return failures
+
+
+if __name__ == "__main__":
+    end_date = datetime.date.today()
+    start_date = end_date.replace(day=1)
+    failures = check_query_plans(start_date, end_date)
+    for name, tables in failures.items():
+        print(f"FALHA {name}: Seq Scan em {', '.join(sorted(set(tables)))}")
+    if failures:
+        sys.exit(1)
+    print("OK: nenhuma consulta de relatório usa Seq Scan nas tabelas de vendas")
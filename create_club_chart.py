@@ -1,6 +1,9 @@
 import altair as alt
 import pandas as pd
+from instrumentation import timed_chart
+from chart_data import downsample_series, project
 
+@timed_chart
 def create_club_chart(df: pd.DataFrame):
     """
     Cria e retorna um gráfico de linha e pontos com Altair para a taxa de CPF Clube acumulada.
@@ -11,6 +14,15 @@ def create_club_chart(df: pd.DataFrame):
     Returns:
         alt.Chart: O gráfico combinado do Altair.
     """
+    # Um único conjunto de dados, só com as colunas usadas e no máximo
+    # MAX_POINTS_PER_SERIES pontos por vendedor, compartilhado pelas duas camadas
+    df = downsample_series(
+        project(df, ['Data da Venda', 'Vendedor', '% CPF Clube (Acumulado)']),
+        x='Data da Venda',
+        series='Vendedor'
+    )
+    base = alt.Chart(df)
+
     # Obtém os valores mínimo e máximo do percentual para definir o domínio do eixo Y
     min_pct = df['% CPF Clube (Acumulado)'].min()
     max_pct = df['% CPF Clube (Acumulado)'].max()
@@ -21,7 +33,7 @@ def create_club_chart(df: pd.DataFrame):
     y_ticks = list(range(int(min_pct), int(max_pct) + 5, 5)) # Exemplo: [50, 55, 60]
 
     # Cria o gráfico de linhas com Altair
-    line_chart = alt.Chart(df).mark_line().encode(
+    line_chart = base.mark_line().encode(
         x=alt.X(
             'Data da Venda:T',
             title=None,
@@ -47,7 +59,7 @@ def create_club_chart(df: pd.DataFrame):
     )
 
     # Adiciona as bolinhas nos pontos de dados
-    circle_chart = alt.Chart(df).mark_circle(size=60).encode(
+    circle_chart = base.mark_circle(size=60).encode(
         x=alt.X(
             'Data da Venda:T',
             title='Data da Venda',
@@ -77,18 +89,20 @@ def create_club_chart(df: pd.DataFrame):
     return final_chart
 
 
+@timed_chart
 def create_ranking_chart(df: pd.DataFrame):
     """
     Cria e retorna um gráfico de ranking com Altair para a taxa de CPF Clube acumulada final.
 
     Args:
-        df (pd.DataFrame): DataFrame com os dados de vendas, já processado e renomeado.
+        df (pd.DataFrame): Uma linha por vendedor, com 'Vendedor' e '% CPF Clube (Acumulado)'
+            (ex.: PrefixSumIndex.ratio sobre o recorte escolhido).
 
     Returns:
         alt.Chart: O gráfico combinado de ranking do Altair.
     """
-    # 1. Processar os dados: Encontrar a última entrada (maior data) para cada vendedor
-    df_ranking = df.loc[df.groupby('Vendedor')['Data da Venda'].idxmax()]
+    # 1. Apenas as colunas usadas no gráfico
+    df_ranking = project(df, ['Vendedor', '% CPF Clube (Acumulado)'])
 
     # 2. Criar o gráfico de barras para o ranking
     base_chart = alt.Chart(df_ranking).encode(
@@ -1,6 +1,9 @@
 import altair as alt
 import pandas as pd
+from instrumentation import timed_chart
+from chart_data import project
 
+@timed_chart
 def create_sale_items_chart(df: pd.DataFrame):
     """
     Gera um gráfico de barras interativo que exibe vendas por atendente e o total do item.
@@ -8,27 +11,28 @@ def create_sale_items_chart(df: pd.DataFrame):
     Args:
         df (pd.DataFrame): DataFrame com colunas ['item', 'atendente', 'vendas_totais'].
     """
-    # 1. Calcula o total de vendas por item
-    df_total = df.groupby('item', as_index=False)['vendas_totais'].sum().rename(columns={'vendas_totais': 'total_item'})
-    
-    # 2. Faz merge para ter a coluna 'total_item' no DataFrame original
-    df = df.merge(df_total, on='item', how='left')
+    # 1. Um único conjunto de dados, só com as colunas usadas; o total de cada item é calculado
+    #    no próprio Vega-Lite (joinaggregate) em vez de ir como uma segunda tabela
+    base = alt.Chart(project(df, ['item', 'atendente', 'vendas_totais'])).transform_joinaggregate(
+        total_item='sum(vendas_totais)',
+        groupby=['item']
+    )
 
-    # 3. Seleção interativa pelo atendente
+    # 2. Seleção interativa pelo atendente
     atendente_select = alt.selection_point(fields=['atendente'], bind='legend')
 
-    # 4. Base cinza com total do item
-    base_chart = alt.Chart(df_total).mark_bar(color='lightgray').encode(
+    # 3. Base cinza com total do item
+    base_chart = base.mark_bar(color='lightgray').encode(
         y=alt.Y("item:N", sort='-x', title="Item"),
-        x=alt.X("total_item:Q", title="Vendas Totais", sort='-y'),
+        x=alt.X("max(total_item):Q", title="Vendas Totais", sort='-y'),
         tooltip=[
             alt.Tooltip("item", title="Item"),
-            alt.Tooltip("total_item:Q", title="Total do Item", format=",")
+            alt.Tooltip("max(total_item):Q", title="Total do Item", format=",")
         ]
     )
 
-    # 5. Barras coloridas por atendente
-    selected_chart = alt.Chart(df).mark_bar().encode(
+    # 4. Barras coloridas por atendente
+    selected_chart = base.mark_bar().encode(
         y=alt.Y("item:N", sort='-x', title=None),
         x=alt.X("vendas_totais:Q", title=None , sort='-y'),
         color=alt.Color("atendente:N", legend=alt.Legend(title="Atendente")),
@@ -41,7 +45,7 @@ def create_sale_items_chart(df: pd.DataFrame):
         ]
     ).add_params(atendente_select)
 
-    # 6. Gráfico final
+    # 5. Gráfico final
     final_chart = (base_chart + selected_chart).properties(
         title="Vendas de Itens por Atendente"
     ).interactive()
@@ -1,8 +1,10 @@
-import streamlit as st
 import pandas as pd
+from instrumentation import timed_chart
 import altair as alt
 import datetime
+from chart_data import downsample_series, project
 
+@timed_chart
 def create_sales_chart_by_user(df: pd.DataFrame):
     """
     Cria e retorna um gráfico de linha e pontos com Altair para o 
@@ -14,9 +16,16 @@ def create_sales_chart_by_user(df: pd.DataFrame):
     Returns:
         alt.Chart: O gráfico combinado do Altair.
     """
+    # Um único conjunto de dados, só com as colunas usadas e no máximo
+    # MAX_POINTS_PER_SERIES pontos por atendente (o DataFrame original não é alterado)
+    df = project(df, ['Data', 'Atendente', '% Venda Itens Acumulado'])
+
     # Garante que o campo percentual está em formato numérico
     df['% Venda Itens Acumulado'] = pd.to_numeric(df['% Venda Itens Acumulado'], errors='coerce')
 
+    df = downsample_series(df, x='Data', series='Atendente')
+    base = alt.Chart(df)
+
     # Obtém valores mínimo e máximo para definir o eixo Y
     min_pct = df['% Venda Itens Acumulado'].min()
     max_pct = df['% Venda Itens Acumulado'].max()
@@ -25,7 +34,7 @@ def create_sales_chart_by_user(df: pd.DataFrame):
     y_ticks = list(range(int(min_pct), int(max_pct) + 5, 5))
 
     # Gráfico de linha
-    line_chart = alt.Chart(df).mark_line().encode(
+    line_chart = base.mark_line().encode(
         x=alt.X(
             'Data:T',
             title=None,
@@ -54,7 +63,7 @@ def create_sales_chart_by_user(df: pd.DataFrame):
     )
 
     # Gráfico de pontos
-    circle_chart = alt.Chart(df).mark_circle(size=60).encode(
+    circle_chart = base.mark_circle(size=60).encode(
         x=alt.X(
             'Data:T',
             title='Data',
@@ -85,4 +94,47 @@ def create_sales_chart_by_user(df: pd.DataFrame):
     # Combina os dois gráficos
     final_chart = alt.layer(line_chart, circle_chart).interactive()
 
-    return final_chart
\ No newline at end of file
+    return final_chart
+
+@timed_chart
+def create_items_ranking_chart(df_total: pd.DataFrame):
+    """
+    Cria e retorna o gráfico de ranking do % de Venda de Itens acumulado por atendente.
+
+    Args:
+        df_total (pd.DataFrame): Uma linha por atendente, com 'Atendente' e '% Venda Itens Acumulado'
+            (ex.: PrefixSumIndex.ratio sobre o recorte escolhido).
+
+    Returns:
+        alt.Chart: O gráfico combinado de ranking do Altair.
+    """
+    # Garantir que o campo é numérico e ajustar escala
+    df_total = project(df_total, ['Atendente', '% Venda Itens Acumulado'])
+    df_total['% Venda Itens Acumulado'] = pd.to_numeric(df_total['% Venda Itens Acumulado'], errors='coerce') / 100
+    max_val = df_total['% Venda Itens Acumulado'].max() * 1.1
+
+    base_chart = alt.Chart(df_total).encode(
+        y=alt.Y('Atendente', sort='-x', title='Vendedor'),
+        x=alt.X(
+            '% Venda Itens Acumulado',
+            scale=alt.Scale(domain=[0, max_val]),  # Sempre de 0 até 100%
+            axis=alt.Axis(format='.2%')
+        ),
+        tooltip=[
+            'Atendente',
+            alt.Tooltip('% Venda Itens Acumulado:Q', format='.2%', title='Percentual')
+        ],
+        color=alt.Color('Atendente', legend=None)
+    )
+
+    bar_chart = base_chart.mark_bar()
+
+    text_chart = base_chart.mark_text(
+        align='left',
+        baseline='middle',
+        dx=3
+    ).encode(
+        text=alt.Text('% Venda Itens Acumulado', format='.2%')
+    )
+
+    return (bar_chart + text_chart).interactive()
@@ -0,0 +1,262 @@
+import os
+import sqlite3
+import datetime
+import threading
+import pandas as pd
+from get_connection import get_report_connection
+from fetch_frame import fetch_frame
+from rollups import ROLLUP_OVERLAP, WATERMARK_NAME
+from report_queries import USE_ROLLUPS, date_range_predicate, report_filters, sale_date_predicate, sale_date_params
+from user_directory import attach_seller_names, excluded_seller_ids
+
+# Caminho do banco SQLite local (pode ser sobrescrito pela variável de ambiente)
+DAILY_STORE_PATH = os.environ.get("CLUB_DAILY_STORE_PATH", os.path.join(".cache", "club_daily.sqlite3"))
+
+# Serializa a gravação do delta entre as sessões do Streamlit
+_write_lock = threading.Lock()
+
+# Versão do esquema local; ao mudar, o cache é descartado e recarregado do Postgres
+_SCHEMA_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vendas_dia (
+    store_id INTEGER NOT NULL,
+    data_venda TEXT NOT NULL,
+    opened_by INTEGER NOT NULL,
+    qty_cpf_club INTEGER NOT NULL,
+    vendas_totais INTEGER NOT NULL,
+    PRIMARY KEY (store_id, data_venda, opened_by)
+);
+CREATE TABLE IF NOT EXISTS dias_carregados (
+    store_id INTEGER NOT NULL,
+    data_venda TEXT NOT NULL,
+    PRIMARY KEY (store_id, data_venda)
+);
+"""
+
+# Fatos diários por loja e vendedor, sem funções de janela (os acumulados são calculados
+# localmente). Todos os vendedores são guardados, só pelo id; os nomes (user_directory) e as
+# exclusões são aplicados na leitura.
+DELTA_QUERY = """
+    SELECT
+        CH.STORE_ID AS store_id,
+        DATE(S.CREATED_AT) AS data_venda,
+        CH.OPENED_BY AS opened_by,
+        SUM(CASE WHEN COALESCE(S.client_cpf, '') <> '' THEN 1 ELSE 0 END) AS qty_cpf_club,
+        COUNT(1) AS vendas_totais
+    FROM CASH_HISTORY CH
+    INNER JOIN SALES S ON S.CASH_HISTORY_ID = CH.ID
+    WHERE CH.STORE_ID = ANY(%s)
+        AND ({periodos})
+        AND S.TYPE = 0
+        AND S.abstract_sale = false
+    GROUP BY CH.STORE_ID, CH.OPENED_BY, DATE(S.CREATED_AT)
+"""
+
+# Mesmos fatos lidos da tabela de agregados diários (migrations/003_report_rollups.sql)
+ROLLUP_DELTA_QUERY = """
+    SELECT
+        R.STORE_ID AS store_id,
+        R.SALE_DATE AS data_venda,
+        R.OPENED_BY AS opened_by,
+        R.QTY_CPF_CLUB AS qty_cpf_club,
+        R.VENDAS_TOTAIS AS vendas_totais
+    FROM REPORT_ROLLUP_SELLER_DAY R
+    WHERE R.STORE_ID = ANY(%s)
+        AND ({periodos})
+"""
+
+# Dias anteriores a `cutoff` já estão encerrados e podem ser marcados como carregados. A data vem
+# do banco (a mesma base de DATE(S.CREATED_AT)), não do relógio do servidor do app, e ontem é
+# sempre rebuscado: vendas lançadas perto da virada do dia ainda podem chegar. Numa réplica, só os
+# dias que terminaram antes da última transação reaplicada (ou todos, se ela já reaplicou tudo o
+# que recebeu). Lendo dos agregados, também só os dias que a marca d'água já cobre fora da janela
+# de sobreposição do refresh
+_CLOSED_CUTOFF_QUERY = """
+    SELECT LEAST(
+        CURRENT_DATE - 1,
+        CASE
+            WHEN NOT pg_is_in_recovery() THEN CURRENT_DATE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN CURRENT_DATE
+            ELSE COALESCE(DATE(pg_last_xact_replay_timestamp()), DATE '1970-01-01')
+        END
+        {rollup}
+    ) AS cutoff
+"""
+
+_ROLLUP_CUTOFF = """,
+        COALESCE(
+            (SELECT DATE(watermark - %s) FROM REPORT_ROLLUP_WATERMARK WHERE name = %s),
+            DATE '1970-01-01'
+        )"""
+
+# Tipos das colunas do delta (data_venda é lida como data)
+DELTA_DTYPES = {
+    'store_id': 'int64',
+    'opened_by': 'int64',
+    'qty_cpf_club': 'int64',
+    'vendas_totais': 'int64',
+}
+
+
+def _connect():
+    """
+    Abre uma conexão com o SQLite local, criando o arquivo e as tabelas se necessário.
+    """
+    directory = os.path.dirname(DAILY_STORE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(DAILY_STORE_PATH, timeout=30)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+        conn.executescript(f"DROP TABLE IF EXISTS vendas_dia; DROP TABLE IF EXISTS dias_carregados; PRAGMA user_version = {_SCHEMA_VERSION};")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _missing_days(conn, store_id, start_date, end_date, today):
+    """
+    Retorna os dias do período que precisam ser buscados no Postgres:
+    os que nunca foram carregados e qualquer dia a partir de hoje (ainda em aberto).
+    """
+    loaded = {
+        row[0] for row in conn.execute(
+            "SELECT data_venda FROM dias_carregados WHERE store_id = ? AND data_venda BETWEEN ? AND ?",
+            (store_id, start_date.isoformat(), end_date.isoformat()),
+        )
+    }
+    days = pd.date_range(start_date, end_date, freq="D").date
+    return [d for d in days if d >= today or d.isoformat() not in loaded]
+
+
+def _contiguous_runs(days):
+    """
+    Agrupa uma lista ordenada de dias em intervalos contíguos [(início, fim), ...].
+    """
+    runs = []
+    for day in days:
+        if runs and day - runs[-1][1] == datetime.timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+def _fetch_delta(store_ids, runs):
+    """
+    Busca no Postgres, em uma única consulta, os fatos diários por loja e vendedor dos intervalos informados.
+
+    Returns:
+        tuple[pd.DataFrame, datetime.date]: O delta e a data a partir da qual os dias ainda podem mudar
+        (lida na mesma conexão, ver _CLOSED_CUTOFF_QUERY).
+    """
+    if USE_ROLLUPS:
+        query, predicate = ROLLUP_DELTA_QUERY, date_range_predicate("R.SALE_DATE")
+        cutoff_query, cutoff_params = _CLOSED_CUTOFF_QUERY.format(rollup=_ROLLUP_CUTOFF), (ROLLUP_OVERLAP, WATERMARK_NAME)
+    else:
+        query, predicate = DELTA_QUERY, sale_date_predicate()
+        cutoff_query, cutoff_params = _CLOSED_CUTOFF_QUERY.format(rollup=""), ()
+    periodos = " OR ".join([f"({predicate})"] * len(runs))
+    params = [store_ids] + [param for run in runs for param in sale_date_params(*run)]
+    with get_report_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(cutoff_query, cutoff_params)
+            cutoff = cursor.fetchone()['cutoff']
+        delta = fetch_frame(conn, query.format(periodos=periodos), params, DELTA_DTYPES, date_columns=('data_venda',))
+    return delta, cutoff
+
+
+def sync_daily_sales(start_date, end_date, store_ids=None):
+    """
+    Garante que o armazenamento local tenha os fatos diários do período para as lojas,
+    buscando no Postgres apenas os dias faltantes e o dia de hoje em uma única consulta.
+
+    Os dias que faltam em qualquer uma das lojas são buscados para todas elas,
+    para que o lote inteiro continue custando uma ida ao banco.
+
+    Args:
+        start_date (datetime.date): Data inicial do período.
+        end_date (datetime.date): Data final do período.
+        store_ids (list[int]): Lojas a sincronizar (padrão: DEFAULT_STORE_IDS).
+    """
+    store_ids, _ = report_filters(store_ids)
+    today = datetime.date.today()
+    with _write_lock:
+        conn = _connect()
+        try:
+            missing = sorted({
+                day
+                for store_id in store_ids
+                for day in _missing_days(conn, store_id, start_date, end_date, today)
+            })
+            if not missing:
+                return
+
+            # Uma única consulta cobrindo apenas os intervalos faltantes
+            runs = _contiguous_runs(missing)
+            delta, cutoff = _fetch_delta(store_ids, runs)
+
+            with conn:
+                conn.executemany(
+                    "DELETE FROM vendas_dia WHERE store_id = ? AND data_venda BETWEEN ? AND ?",
+                    [
+                        (store_id, run_start.isoformat(), run_end.isoformat())
+                        for store_id in store_ids
+                        for run_start, run_end in runs
+                    ],
+                )
+                conn.executemany(
+                    "INSERT INTO vendas_dia VALUES (?, ?, ?, ?, ?)",
+                    zip(
+                        delta['store_id'].tolist(),
+                        delta['data_venda'].dt.strftime('%Y-%m-%d'),
+                        delta['opened_by'].tolist(),
+                        delta['qty_cpf_club'].tolist(),
+                        delta['vendas_totais'].tolist(),
+                    ),
+                )
+                # Apenas dias já encerrados no banco são marcados como carregados; hoje e ontem são sempre rebuscados
+                conn.executemany(
+                    "INSERT OR IGNORE INTO dias_carregados VALUES (?, ?)",
+                    [(store_id, d.isoformat()) for store_id in store_ids for d in missing if d < cutoff],
+                )
+        finally:
+            conn.close()
+
+
+def read_daily_sales(start_date, end_date, store_ids=None, excluded_sellers=None):
+    """
+    Lê os fatos diários por loja e vendedor do armazenamento local, sincronizando antes o que faltar.
+
+    Args:
+        start_date (datetime.date): Data inicial do período.
+        end_date (datetime.date): Data final do período.
+        store_ids (list[int]): Lojas a consultar (padrão: DEFAULT_STORE_IDS).
+        excluded_sellers (list[str]): Vendedores a ignorar (padrão: DEFAULT_EXCLUDED_SELLERS).
+
+    Returns:
+        pd.DataFrame: Colunas ['store_id', 'data_venda', 'opened_by', 'nome_usuario', 'qty_cpf_club', 'vendas_totais'],
+        com 'nome_usuario' categórico (ver user_directory).
+    """
+    store_ids, excluded_sellers = report_filters(store_ids, excluded_sellers)
+    sync_daily_sales(start_date, end_date, store_ids)
+
+    conn = _connect()
+    try:
+        df = pd.read_sql_query(
+            f"""
+            SELECT store_id, data_venda, opened_by, qty_cpf_club, vendas_totais
+            FROM vendas_dia
+            WHERE store_id IN ({", ".join("?" * len(store_ids))}) AND data_venda BETWEEN ? AND ?
+            """,
+            conn,
+            params=(*store_ids, start_date.isoformat(), end_date.isoformat()),
+        )
+    finally:
+        conn.close()
+
+    # Mesma semântica de `U.NAME NOT IN (...)`: vendedores sem nome também ficam de fora
+    df = df[~df['opened_by'].isin(excluded_seller_ids(excluded_sellers))]
+    df = attach_seller_names(df, 'nome_usuario', drop_ids=False)
+    df = df[['store_id', 'data_venda', 'opened_by', 'nome_usuario', 'qty_cpf_club', 'vendas_totais']]
+    df['data_venda'] = pd.to_datetime(df['data_venda']).dt.date
+    return df
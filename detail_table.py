@@ -0,0 +1,125 @@
+import math
+import os
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+# Linhas por página enviadas ao navegador nas tabelas detalhadas
+DETAIL_PAGE_SIZE = 100
+
+# Linhas convertidas por vez na exportação completa
+EXPORT_CHUNK_ROWS = 50_000
+
+# Formatos de exportação: rótulo -> (extensão, tipo MIME)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def export_file(df: pd.DataFrame, fmt='CSV', chunk_rows=EXPORT_CHUNK_ROWS) -> str:
+    """
+    Grava o DataFrame inteiro em CSV ou Parquet num arquivo temporário, `chunk_rows` linhas
+    por vez: cada bloco convertido vai direto para o disco, sem acumular o arquivo em memória
+    nem criar uma cópia de texto (ou tabela Arrow) do DataFrame todo de uma vez.
+
+    Args:
+        df (pd.DataFrame): Dados a exportar.
+        fmt (str): 'CSV' ou 'Parquet' (um row group por bloco).
+        chunk_rows (int): Linhas por bloco.
+
+    Returns:
+        str: Caminho do arquivo temporário; quem chama deve removê-lo.
+    """
+    extension, _ = EXPORT_FORMATS[fmt]
+    fd, path = tempfile.mkstemp(suffix=f".{extension}")
+    os.close(fd)
+    try:
+        if fmt == 'Parquet':
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            with pq.ParquetWriter(path, schema) as writer:
+                for start in range(0, len(df), chunk_rows):
+                    chunk = df.iloc[start:start + chunk_rows]
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            return path
+
+        # utf-8-sig: o Excel reconhece a acentuação do arquivo
+        with open(path, 'w', encoding='utf-8-sig', newline='') as file:
+            df.head(0).to_csv(file, index=False)
+            for start in range(0, len(df), chunk_rows):
+                df.iloc[start:start + chunk_rows].to_csv(file, index=False, header=False)
+        return path
+    except Exception:
+        os.remove(path)
+        raise
+
+
+def detail_table(df: pd.DataFrame, key, filter_column=None, page_size=DETAIL_PAGE_SIZE, export_name="dados"):
+    """
+    Mostra uma tabela detalhada paginada no servidor: filtro, ordenação e paginação são
+    aplicados aqui e só as linhas da página atual são enviadas ao navegador. A exportação
+    completa (já filtrada e ordenada) é gerada apenas quando pedida.
+
+    Args:
+        df (pd.DataFrame): Dados completos.
+        key (str): Prefixo das chaves dos widgets (único por tabela na página).
+        filter_column (str): Coluna usada no filtro (ex.: 'Vendedor').
+        page_size (int): Linhas por página.
+        export_name (str): Nome base do arquivo exportado.
+    """
+    col_filter, col_sort, col_order = st.columns([3, 2, 1])
+    selected = []
+    if filter_column is not None:
+        with col_filter:
+            selected = st.multiselect(
+                filter_column,
+                sorted(df[filter_column].dropna().unique()),
+                placeholder="Todos",
+                key=f"{key}_filter"
+            )
+    with col_sort:
+        sort_column = st.selectbox("Ordenar por", list(df.columns), index=None, placeholder="Ordem original", key=f"{key}_sort")
+    with col_order:
+        descending = st.toggle("Decrescente", value=False, key=f"{key}_desc")
+
+    view = df[df[filter_column].isin(selected)] if selected else df
+    if sort_column is not None:
+        view = view.sort_values(sort_column, ascending=not descending, kind='stable')
+
+    # A página fica só no session_state (sem `value=` no widget, que o Streamlit recusaria junto
+    # com a escrita na chave): começa em 1 e volta para a última se um filtro a fez deixar de existir
+    n_pages = max(1, math.ceil(len(view) / page_size))
+    page_key = f"{key}_page"
+    if page_key not in st.session_state:
+        st.session_state[page_key] = 1
+    elif st.session_state[page_key] > n_pages:
+        st.session_state[page_key] = n_pages
+
+    page = st.number_input("Página", min_value=1, max_value=n_pages, step=1, key=page_key)
+    first = (page - 1) * page_size
+    st.dataframe(view.iloc[first:first + page_size], hide_index=True)
+    st.caption(f"Linhas {min(first + 1, len(view))}–{min(first + page_size, len(view))} de {len(view)} · página {page} de {n_pages}")
+
+    col_fmt, col_export = st.columns([1, 3])
+    with col_fmt:
+        fmt = st.segmented_control("Formato", list(EXPORT_FORMATS), default='CSV', key=f"{key}_fmt") or 'CSV'
+    with col_export:
+        if st.button("Preparar exportação completa", key=f"{key}_export"):
+            extension, mime = EXPORT_FORMATS[fmt]
+            path = export_file(view, fmt)
+            # O Streamlit lê o arquivo inteiro para o seu armazenamento de mídia ao montar o botão:
+            # a conversão vai por blocos para o disco, mas o arquivo servido ao navegador fica em
+            # memória até a sessão descartá-lo. Depois disso o temporário pode ser apagado
+            try:
+                with open(path, 'rb') as file:
+                    st.download_button(
+                        f"Baixar {len(view)} linhas ({fmt})",
+                        data=file,
+                        file_name=f"{export_name}.{extension}",
+                        mime=mime,
+                        key=f"{key}_download"
+                    )
+            finally:
+                os.remove(path)
@@ -0,0 +1,134 @@
+import io
+import os
+import uuid
+import psycopg2.extensions
+import pandas as pd
+from instrumentation import current_report, timed
+
+# Linhas trazidas por ida ao servidor no modo streaming; 0 desliga o streaming (COPY único)
+STREAM_ITERSIZE = int(os.environ.get("CLUB_STREAM_ITERSIZE", "0"))
+
+
+def fetch_frame(conn, query, params, dtypes, date_columns=()):
+    """
+    Executa a consulta via `COPY ... TO STDOUT` e carrega o resultado direto em um DataFrame tipado.
+
+    Evita o caminho RealDictCursor + fetchall, que cria um dict por linha e objetos
+    Decimal para cada valor NUMERIC: o Postgres serializa o resultado em CSV e o
+    leitor do pyarrow o converte em colunas com os tipos declarados.
+
+    Args:
+        conn: Conexão psycopg2 (emprestada de get_connection).
+        query (str): Consulta SELECT com placeholders `%s`.
+        params (tuple): Parâmetros da consulta.
+        dtypes (dict): Tipo de cada coluna não-data do resultado (ex.: {'vendas_totais': 'int64'}).
+        date_columns (tuple): Colunas de data, retornadas como datetime64.
+
+    Returns:
+        pd.DataFrame: Resultado com as colunas na ordem da consulta.
+    """
+    buffer = io.BytesIO()
+    with conn.cursor() as cursor:
+        # COPY não aceita parâmetros: a consulta é montada com escape pelo próprio psycopg2
+        sql = cursor.mogrify(query.strip().rstrip(';'), params).decode()
+        cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT CSV, HEADER)", buffer)
+    buffer.seek(0)
+
+    with timed('pandas', f"{current_report()}.parse") as timing:
+        df = pd.read_csv(buffer, engine="pyarrow", dtype=dtypes)
+        for col in date_columns:
+            df[col] = pd.to_datetime(df[col])
+        timing.rows = len(df)
+        timing.nbytes = buffer.getbuffer().nbytes
+    return df
+
+
+def iter_frames(conn, query, params, dtypes, date_columns=(), itersize=None):
+    """
+    Gera o resultado da consulta em blocos de até `itersize` linhas, usando um cursor
+    nomeado (do lado do servidor), de modo que só um bloco fique em memória por vez.
+
+    Com `itersize` 0 (padrão de CLUB_STREAM_ITERSIZE) o resultado vem inteiro, em um
+    único bloco, por `fetch_frame`.
+
+    Args:
+        conn: Conexão psycopg2 (emprestada de get_connection), fora de autocommit.
+        query (str): Consulta SELECT com placeholders `%s`.
+        params (tuple): Parâmetros da consulta.
+        dtypes (dict): Tipo de cada coluna não-data do resultado.
+        date_columns (tuple): Colunas de data, retornadas como datetime64.
+        itersize (int): Linhas por bloco (padrão: STREAM_ITERSIZE).
+
+    Yields:
+        pd.DataFrame: Blocos com as colunas na ordem da consulta.
+    """
+    itersize = STREAM_ITERSIZE if itersize is None else itersize
+    if itersize <= 0:
+        yield fetch_frame(conn, query, params, dtypes, date_columns)
+        return
+
+    # Cursor de tuplas: o RealDictCursor criaria um dict por linha
+    name = f"report_{uuid.uuid4().hex}"
+    with conn.cursor(name=name, cursor_factory=psycopg2.extensions.cursor) as cursor:
+        cursor.itersize = itersize
+        with timed('sql', current_report()):
+            cursor.execute(query, params)
+        while True:
+            with timed('sql', f"{current_report()}.fetch") as timing:
+                rows = cursor.fetchmany(itersize)
+                timing.rows = len(rows)
+            if not rows:
+                break
+            with timed('pandas', f"{current_report()}.parse") as timing:
+                chunk = pd.DataFrame.from_records(rows, columns=[col.name for col in cursor.description])
+                chunk = chunk.astype(dtypes)
+                for col in date_columns:
+                    chunk[col] = pd.to_datetime(chunk[col])
+                timing.rows = len(chunk)
+            yield chunk
+
+
+class ChunkedGroupBy:
+    """
+    Agrupamento incremental: cada bloco é agregado e somado ao parcial acumulado, de
+    modo que a memória depende da quantidade de grupos e não da de linhas lidas.
+
+    Só aceita agregações que podem ser recombinadas: 'sum', 'max', 'min' e 'size'.
+
+    Example:
+        totals = ChunkedGroupBy(['store_id', 'item'], {'vendas': ('sale_id', 'size')})
+        for chunk in iter_frames(...):
+            totals.add(chunk)
+        df = totals.result()
+    """
+
+    # Como recombinar o parcial de cada agregação
+    _COMBINE = {'sum': 'sum', 'max': 'max', 'min': 'min', 'size': 'sum'}
+
+    def __init__(self, keys, aggs):
+        unsupported = {func for _, func in aggs.values()} - set(self._COMBINE)
+        if unsupported:
+            raise ValueError(f"Agregações não combináveis: {sorted(unsupported)}")
+        self.keys = list(keys)
+        self.aggs = dict(aggs)
+        self._partial = None
+
+    def add(self, chunk):
+        if chunk.empty:
+            return
+        partial = chunk.groupby(self.keys, as_index=False).agg(**self.aggs)
+        if self._partial is not None:
+            combined = pd.concat([self._partial, partial], ignore_index=True)
+            partial = combined.groupby(self.keys, as_index=False).agg(**{
+                out: (out, self._COMBINE[func]) for out, (_, func) in self.aggs.items()
+            })
+        self._partial = partial
+
+    def result(self):
+        """
+        Returns:
+            pd.DataFrame: Uma linha por grupo, com as colunas `keys` e as de `aggs`.
+        """
+        if self._partial is None:
+            return pd.DataFrame(columns=self.keys + list(self.aggs))
+        return self._partial
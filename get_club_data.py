@@ -1,88 +1,104 @@
-import streamlit as st
 import psycopg2
 import pandas as pd
 from psycopg2.extras import RealDictCursor
 import datetime 
-from get_connection import get_connection
+from daily_store import read_daily_sales
+from period_rollup import rollup_engine_for
+from instrumentation import timed
 
 
 # Função para buscar dados
-def get_club_data(start_date, end_date):
-    query = """
-    WITH vendas_agrupadas AS (
-        SELECT 
-            DATE(S.CREATED_AT) AS data_venda,
-            ---CAST(SUM(CASE WHEN S.CPF_USED_CLUB = TRUE THEN 1 ELSE 0 END) AS NUMERIC) AS qty_cpf_club,
-            CAST(SUM(CASE WHEN COALESCE(S.client_cpf, '') <> '' THEN 1 ELSE 0 END) AS NUMERIC) AS qty_cpf_club,
-
-            CAST(COUNT(1) AS NUMERIC) AS vendas_totais,
-            CH.OPENED_BY,
-            MAX(U.NAME) AS nome_usuario
-        FROM CASH_HISTORY CH  
-        LEFT JOIN USER_THE_BEST U ON U.ID = CH.OPENED_BY 
-        INNER JOIN SALES S ON S.CASH_HISTORY_ID = CH.ID 
-        WHERE CH.STORE_ID = 467
-            AND DATE(S.CREATED_AT) >= %s
-            AND DATE(S.CREATED_AT) <= %s
-            AND S.TYPE = 0
-            AND U.NAME NOT IN ('juliano')
-            AND S.abstract_sale = false
-        GROUP BY CH.OPENED_BY, DATE(S.CREATED_AT)
-    )
-    SELECT 
-        data_venda,
-        nome_usuario,
-        qty_cpf_club, 
-        vendas_totais,
-        ROUND((qty_cpf_club / vendas_totais) * 100, 2) AS pct_cpf_club,
-        COALESCE(SUM(qty_cpf_club) OVER (PARTITION BY OPENED_BY ORDER BY data_venda ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW), 0) AS qty_cpf_club_acumulado,
-        COALESCE(SUM(vendas_totais) OVER (PARTITION BY OPENED_BY ORDER BY data_venda ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW), 0) AS vendas_totais_acumulado,
-        ROUND(
-            (COALESCE(SUM(qty_cpf_club) OVER (PARTITION BY OPENED_BY ORDER BY data_venda ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW), 0) 
-            / NULLIF(COALESCE(SUM(vendas_totais) OVER (PARTITION BY OPENED_BY ORDER BY data_venda ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW), 0), 0)) * 100, 
-            2
-        ) AS pct_cpf_club_acumulado
-    FROM vendas_agrupadas
-    ORDER BY data_venda DESC , nome_usuario ASC;
+def get_club_data(start_date, end_date, store_ids=None, excluded_sellers=None):
+    """
+    Retorna os dados diários de CPF Clube por loja e vendedor, com os acumulados do período.
+
+    Os fatos diários vêm do armazenamento local (daily_store), que busca no Postgres
+    apenas os dias ainda não carregados e o dia de hoje; os acumulados são recalculados aqui.
+
+    Args:
+        start_date (datetime.date): Data inicial do período.
+        end_date (datetime.date): Data final do período.
+        store_ids (list[int]): Lojas a consultar (padrão: DEFAULT_STORE_IDS).
+        excluded_sellers (list[str]): Vendedores fora do ranking (padrão: DEFAULT_EXCLUDED_SELLERS).
+
+    Returns:
+        pd.DataFrame: DataFrame diário por loja e vendedor, com as colunas já renomeadas.
     """
+    df_daily = read_daily_sales(start_date, end_date, store_ids, excluded_sellers)
+    with timed('pandas', 'get_club_data') as timing:
+        df = accumulate_club_data(df_daily)
+        timing.rows = len(df)
+    return df
+
 
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            cursor.execute(query, (start_date, end_date))
-            data = cursor.fetchall()
-            df = pd.DataFrame(data)
-            if not df.empty:
-                df['pct_cpf_club'] = pd.to_numeric(df['pct_cpf_club'], errors='coerce')
-                df['pct_cpf_club_acumulado'] = pd.to_numeric(df['pct_cpf_club_acumulado'], errors='coerce')
-                df['qty_cpf_club'] = pd.to_numeric(df['qty_cpf_club'], errors='coerce')
-                df['vendas_totais'] = pd.to_numeric(df['vendas_totais'], errors='coerce')
-                df['vendas_totais_acumulado'] = pd.to_numeric(df['vendas_totais_acumulado'], errors='coerce')
-                df['qty_cpf_club_acumulado'] = pd.to_numeric(df['qty_cpf_club_acumulado'], errors='coerce')
-
-                # 1. Renomeia as colunas
-                column_mapping = {
-                    'data_venda': 'Data da Venda',
-                    'nome_usuario': 'Vendedor',
-                    'qty_cpf_club': 'Qtd. CPF Clube (Dia)',
-                    'vendas_totais': 'Vendas Totais (Dia)',
-                    'pct_cpf_club': '% CPF Clube (Dia)',
-                    'qty_cpf_club_acumulado': 'Qtd. CPF Clube (Acumulado)',
-                    'vendas_totais_acumulado': 'Vendas Totais (Acumulado)',
-                    'pct_cpf_club_acumulado': '% CPF Clube (Acumulado)',
-                }
-                df = df.rename(columns=column_mapping)
-                
-                # 2. Formata os percentuais para usar vírgula e os converte para string
-                #df['% CPF Clube (Dia)'] = df['% CPF Clube (Dia)'].apply(lambda x: f'{x:.2f}'.replace('.', ','))
-                #df['% CPF Clube (Acumulado)'] = df['% CPF Clube (Acumulado)'].apply(lambda x: f'{x:.2f}'.replace('.', ','))
-            return df
+def accumulate_club_data(df):
+    """
+    Calcula os percentuais e acumulados por loja e vendedor a partir dos fatos diários.
+
+    Args:
+        df (pd.DataFrame): Colunas ['store_id', 'data_venda', 'opened_by', 'nome_usuario', 'qty_cpf_club', 'vendas_totais'].
+
+    Returns:
+        pd.DataFrame: DataFrame diário por loja e vendedor, com as colunas já renomeadas.
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    df = df.copy()
+    df['qty_cpf_club'] = df['qty_cpf_club'].astype(float)
+    df['vendas_totais'] = df['vendas_totais'].astype(float)
+
+    # Acumulados por loja e vendedor em ordem cronológica (equivalente às funções de janela da consulta)
+    df = df.sort_values(['store_id', 'opened_by', 'data_venda'])
+    df['pct_cpf_club'] = ((df['qty_cpf_club'] / df['vendas_totais']) * 100).round(2)
+    partition = df.groupby(['store_id', 'opened_by'])
+    df['qty_cpf_club_acumulado'] = partition['qty_cpf_club'].cumsum()
+    df['vendas_totais_acumulado'] = partition['vendas_totais'].cumsum()
+    df['pct_cpf_club_acumulado'] = (
+        (df['qty_cpf_club_acumulado'] / df['vendas_totais_acumulado'].replace(0, float('nan'))) * 100
+    ).round(2)
+
+    df = df.sort_values(['data_venda', 'store_id', 'nome_usuario'], ascending=[False, True, True]).reset_index(drop=True)
+    df = df[[
+        'data_venda',
+        'store_id',
+        'nome_usuario',
+        'qty_cpf_club',
+        'vendas_totais',
+        'pct_cpf_club',
+        'qty_cpf_club_acumulado',
+        'vendas_totais_acumulado',
+        'pct_cpf_club_acumulado',
+    ]]
+
+    # 1. Renomeia as colunas
+    column_mapping = {
+        'data_venda': 'Data da Venda',
+        'store_id': 'Loja',
+        'nome_usuario': 'Vendedor',
+        'qty_cpf_club': 'Qtd. CPF Clube (Dia)',
+        'vendas_totais': 'Vendas Totais (Dia)',
+        'pct_cpf_club': '% CPF Clube (Dia)',
+        'qty_cpf_club_acumulado': 'Qtd. CPF Clube (Acumulado)',
+        'vendas_totais_acumulado': 'Vendas Totais (Acumulado)',
+        'pct_cpf_club_acumulado': '% CPF Clube (Acumulado)',
+    }
+    df = df.rename(columns=column_mapping)
+    return df
         
-import pandas as pd
+# Nomes das colunas semanais, a partir das colunas genéricas do PeriodRollup
+WEEKLY_COLUMN_MAP = {
+    'Início do Período': 'Início da Semana (Segunda-feira)',
+    'Fim do Período': 'Último Dia da Semana (Domingo)',
+    'Vendas Totais': 'Vendas_Totais_Semana',
+    'Qtd. CPF Clube': 'Qtd_CPF_Clube_Semana',
+    '% CPF Clube': '% CPF Clube (Semana)',
+}
 
 def generate_weekly_df(df_daily: pd.DataFrame) -> pd.DataFrame:
     """
     Agrupa os dados diários em uma base semanal, calculando a soma das vendas
-    e a porcentagem de vendas com CPF do clube.
+    e a porcentagem de vendas com CPF do clube. O DataFrame de entrada não é alterado.
 
     Args:
         df_daily (pd.DataFrame): O DataFrame diário retornado pela função get_club_data.
@@ -93,43 +109,8 @@ def generate_weekly_df(df_daily: pd.DataFrame) -> pd.DataFrame:
     if df_daily.empty:
         return pd.DataFrame()
 
-    # Garantir que a coluna de data esteja em formato datetime
-    df_daily['Data da Venda'] = pd.to_datetime(df_daily['Data da Venda'])
-
-    # Criar colunas auxiliares para início e fim da semana
-    df_daily['Início da Semana (Segunda-feira)'] = df_daily['Data da Venda'] - pd.to_timedelta(df_daily['Data da Venda'].dt.weekday, unit='d')
-    df_daily['Último Dia da Semana (Domingo)'] = df_daily['Início da Semana (Segunda-feira)'] + pd.Timedelta(days=6)
-
-    # Agrupar por atendente e intervalo da semana
-    df_weekly = df_daily.groupby(
-        ['Vendedor', 'Início da Semana (Segunda-feira)', 'Último Dia da Semana (Domingo)'],
-        as_index=False
-    ).agg(
-        Vendas_Totais_Semana=('Vendas Totais (Dia)', 'sum'),
-        Qtd_CPF_Clube_Semana=('Qtd. CPF Clube (Dia)', 'sum')
-    )
-
-    # Calcular a porcentagem semanal
-    df_weekly['% CPF Clube (Semana)'] = round(
-        (df_weekly['Qtd_CPF_Clube_Semana'] / df_weekly['Vendas_Totais_Semana']) * 100, 2
-    )
-
-    # Converter colunas de datas para formato apenas de data
-    df_weekly['Início da Semana (Segunda-feira)'] = df_weekly['Início da Semana (Segunda-feira)'].dt.date
-    df_weekly['Último Dia da Semana (Domingo)'] = df_weekly['Último Dia da Semana (Domingo)'].dt.date
-
-    # Reordenar as colunas
-    new_column_order = [
-        'Início da Semana (Segunda-feira)',
-        'Último Dia da Semana (Domingo)',
-        'Vendedor',
-        'Vendas_Totais_Semana',
-        'Qtd_CPF_Clube_Semana',
-        '% CPF Clube (Semana)'
-    ]
-    df_weekly = df_weekly[new_column_order]
-
-    return df_weekly
+    df_weekly, _ = rollup_engine_for(df_daily).rollup('week')
+    return df_weekly.rename(columns=WEEKLY_COLUMN_MAP)
 
 def generate_total_weekly_df(df_weekly):
     """
@@ -144,11 +125,11 @@ def generate_total_weekly_df(df_weekly):
     if df_weekly.empty:
         return pd.DataFrame()
 
-    # Agrupar por semana (sem considerar vendedor) e somar as colunas de vendas
-    df_total = df_weekly.groupby(
-        ['Início da Semana (Segunda-feira)', 'Último Dia da Semana (Domingo)'],
-        as_index=False
-    ).agg(
+    # Agrupar por semana (e loja, quando houver), sem considerar vendedor
+    keys = (['Loja'] if 'Loja' in df_weekly.columns else []) + [
+        'Início da Semana (Segunda-feira)', 'Último Dia da Semana (Domingo)'
+    ]
+    df_total = df_weekly.groupby(keys, as_index=False, sort=True).agg(
         Vendas_Totais_Semana=('Vendas_Totais_Semana', 'sum'),
         Qtd_CPF_Clube_Semana=('Qtd_CPF_Clube_Semana', 'sum')
     )
@@ -158,16 +139,6 @@ def generate_total_weekly_df(df_weekly):
         (df_total['Qtd_CPF_Clube_Semana'] / df_total['Vendas_Totais_Semana']) * 100, 2
     )
 
-    # Converter colunas de datas para formato apenas de data (garantia)
-    df_total['Início da Semana (Segunda-feira)'] = pd.to_datetime(df_total['Início da Semana (Segunda-feira)']).dt.date
-    df_total['Último Dia da Semana (Domingo)'] = pd.to_datetime(df_total['Último Dia da Semana (Domingo)']).dt.date
-
-    # Reordenar as colunas para consistência
-    df_total = df_total[
-        ['Início da Semana (Segunda-feira)', 'Último Dia da Semana (Domingo)',
-         'Vendas_Totais_Semana', 'Qtd_CPF_Clube_Semana', '% CPF Clube (Semana)']
-    ]
-
     return df_total
 
 #start_date = datetime.date(2025, 7, 21) # Primeiro dia de agosto de 2025
@@ -1,14 +1,411 @@
+import time
+import threading
+import functools
+import contextlib
 import psycopg2
+from psycopg2 import pool
 from psycopg2.extras import RealDictCursor
-import streamlit as st
+from settings import get_setting
+from instrumentation import current_report, timed
 
-@st.cache_resource
-def get_connection():
-    return psycopg2.connect(
-        dbname=st.secrets["dbname"],
-        user=st.secrets["user"],
-        password=st.secrets["password"],
-        host=st.secrets["host"],
-        port=st.secrets["port"],
-        cursor_factory=RealDictCursor
+
+class PoolTimeout(pool.PoolError):
+    """Nenhuma conexão ficou livre dentro do tempo limite de checkout."""
+
+
+class QueryCancelled(Exception):
+    """A consulta foi cancelada porque o pedido que a originou foi substituído."""
+
+
+class CancelScope:
+    """
+    Agrupa as conexões usadas por um pedido (ex.: um relatório de um rerun) para que
+    possam ser canceladas juntas. `cancel()` envia o cancelamento ao servidor das consultas
+    em andamento e faz as próximas consultas do escopo falharem com QueryCancelled.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        with self._lock:
+            self._connections.add(conn)
+
+    def detach(self, conn):
+        with self._lock:
+            self._connections.discard(conn)
+
+    def check(self):
+        if self.cancelled:
+            raise QueryCancelled("Pedido substituído por um mais recente")
+
+    def cancel(self):
+        # O cancelamento é enviado com o lock: detach() espera, então a conexão não volta ao
+        # pool (e não é entregue a outro pedido) enquanto o cancelamento está a caminho
+        with self._lock:
+            self.cancelled = True
+            for conn in self._connections:
+                try:
+                    conn.cancel()
+                except psycopg2.Error:
+                    pass
+
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def cancel_scope(scope):
+    """
+    Associa as conexões emprestadas nesta thread, durante o bloco `with`, ao escopo informado.
+    """
+    previous = getattr(_local, 'scope', None)
+    _local.scope = scope
+    try:
+        yield scope
+    finally:
+        _local.scope = previous
+
+
+def current_cancel_scope():
+    return getattr(_local, 'scope', None)
+
+
+class InstrumentedCursor(RealDictCursor):
+    """
+    Cursor que registra a duração, as linhas e os bytes de cada consulta,
+    atribuídos ao relatório em execução na thread (instrumentation.report_span).
+    """
+
+    def execute(self, query, vars=None):
+        scope = current_cancel_scope()
+        if scope is not None:
+            scope.check()
+        with timed('sql', current_report()) as timing:
+            result = super().execute(query, vars)
+            timing.rows = self.rowcount if self.rowcount >= 0 else None
+        return result
+
+    def copy_expert(self, sql, file, size=8192):
+        scope = current_cancel_scope()
+        if scope is not None:
+            scope.check()
+        with timed('sql', current_report()) as timing:
+            start = file.tell()
+            result = super().copy_expert(sql, file, size)
+            timing.nbytes = file.tell() - start
+            timing.rows = self.rowcount if self.rowcount >= 0 else None
+        return result
+
+
+class ConnectionPool:
+    """
+    Pool de conexões psycopg2 seguro para threads, compartilhado entre as sessões do Streamlit.
+
+    Cada checkout recebe uma conexão exclusiva (com seus próprios cursores), que é
+    confirmada ou desfeita ao final do bloco `with` e devolvida ao pool. Conexões
+    derrubadas são descartadas e recriadas de forma transparente.
+    """
+
+    def __init__(self, minconn, maxconn, checkout_timeout=10.0, health_check_interval=30.0, **dsn):
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, cursor_factory=InstrumentedCursor, **dsn)
+        # O ThreadedConnectionPool falha imediatamente quando esgotado; o semáforo faz o checkout aguardar
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._maxconn = maxconn
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'checkouts': 0,
+            'in_use': 0,
+            'timeouts': 0,
+            'reconnects': 0,
+            'cancelled': 0,
+            'wait_total_s': 0.0,
+            'wait_max_s': 0.0,
+        }
+
+    def _is_healthy(self, conn):
+        """
+        Verifica se a conexão continua utilizável. Conexões usadas recentemente
+        não passam pelo `SELECT 1`, para não somar uma ida ao banco a cada checkout.
+        """
+        if conn.closed:
+            return False
+        idle = time.monotonic() - self._last_used.get(id(conn), 0.0)
+        if idle < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def _checkout(self):
+        """
+        Retira uma conexão saudável do pool, reconectando se a atual estiver quebrada.
+        """
+        conn = self._pool.getconn()
+        if not self._is_healthy(conn):
+            self._pool.putconn(conn, close=True)
+            conn = self._pool.getconn()
+            with self._lock:
+                self._stats['reconnects'] += 1
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Empresta uma conexão do pool pelo tempo do bloco `with`. Se a thread estiver em um
+        `cancel_scope`, a conexão fica associada a ele enquanto estiver emprestada.
+
+        Raises:
+            PoolTimeout: Se nenhuma conexão ficar livre em `checkout_timeout` segundos.
+            QueryCancelled: Se o escopo da thread for cancelado antes ou durante as consultas.
+        """
+        scope = current_cancel_scope()
+        if scope is not None:
+            scope.check()
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeout(f"Nenhuma conexão livre após {self.checkout_timeout}s")
+
+        try:
+            conn = self._checkout()
+            waited = time.perf_counter() - started
+            with self._lock:
+                self._stats['checkouts'] += 1
+                self._stats['in_use'] += 1
+                self._stats['wait_total_s'] += waited
+                self._stats['wait_max_s'] = max(self._stats['wait_max_s'], waited)
+
+            if scope is not None:
+                scope.attach(conn)
+            try:
+                yield conn
+                conn.commit()
+            except psycopg2.errors.QueryCanceled as exc:
+                if not conn.closed:
+                    conn.rollback()
+                # O mesmo erro vem do statement_timeout; só o cancelamento do escopo vira QueryCancelled
+                if scope is not None and scope.cancelled:
+                    with self._lock:
+                        self._stats['cancelled'] += 1
+                    raise QueryCancelled("Pedido substituído por um mais recente") from exc
+                raise
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+            finally:
+                if scope is not None:
+                    scope.detach(conn)
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn, close=bool(conn.closed))
+                with self._lock:
+                    self._stats['in_use'] -= 1
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        """
+        Retorna um retrato das métricas do pool, incluindo o tempo de espera por conexão.
+
+        Returns:
+            dict: Checkouts, conexões em uso, timeouts, reconexões, consultas canceladas e tempos de espera (s).
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['maxconn'] = self._maxconn
+        stats['wait_avg_s'] = stats['wait_total_s'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        return stats
+
+    def close(self):
+        self._pool.closeall()
+
+
+# Atraso máximo aceito da réplica, em segundos, antes de ler do primário
+REPLICA_MAX_LAG_S = float(get_setting("replica_max_lag_s", 30))
+
+# Intervalo entre as medições de atraso da réplica, em segundos
+REPLICA_LAG_CHECK_S = 5.0
+
+# Tempo sem tentar a réplica depois de uma falha de conexão, em segundos
+REPLICA_RETRY_S = 30.0
+
+# Atraso de replicação: zero no primário e quando tudo o que foi recebido já foi aplicado
+_REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END AS lag_s
+"""
+
+
+def _dsn(role):
+    """
+    Parâmetros de conexão do primário ou da réplica. As chaves da réplica têm o prefixo
+    `replica_` (ex.: replica_host) e, quando ausentes, herdam as do primário.
+    """
+    keys = ("dbname", "user", "password", "host", "port")
+    if role == "replica":
+        return {key: get_setting(f"replica_{key}", None) or get_setting(key) for key in keys}
+    return {key: get_setting(key) for key in keys}
+
+
+def replica_configured():
+    return get_setting("replica_host", None) is not None
+
+
+@functools.lru_cache(maxsize=None)
+def get_pool(role="primary"):
+    # Um pool por processo e papel, compartilhado por todas as sessões do app (e pelos scripts de linha de comando)
+    return ConnectionPool(
+        minconn=int(get_setting("pool_minconn", 1)),
+        maxconn=int(get_setting("pool_maxconn", 20)),
+        checkout_timeout=float(get_setting("pool_checkout_timeout", 10)),
+        health_check_interval=float(get_setting("pool_health_check_interval", 30)),
+        # Limite de cada consulta no servidor; scripts de manutenção podem desligá-lo com SET LOCAL
+        options=f"-c statement_timeout={int(get_setting('statement_timeout_ms', 60000))}",
+        **_dsn(role),
     )
+
+
+class ReplicaRouter:
+    """
+    Decide, a cada conexão de relatório, entre a réplica de leitura e o primário.
+
+    A réplica é usada quando configurada, acessível e com atraso de até `max_lag_s`
+    (medido no máximo a cada REPLICA_LAG_CHECK_S). Se ela cair, as leituras vão para o
+    primário por REPLICA_RETRY_S segundos antes de uma nova tentativa.
+    """
+
+    def __init__(self, max_lag_s=REPLICA_MAX_LAG_S):
+        self.max_lag_s = max_lag_s
+        self._lock = threading.Lock()
+        self._lag_s = None
+        self._checked_at = 0.0
+        self._down_until = 0.0
+        self._decisions = {}
+        self._stats = {'replica': 0, 'primary': 0, 'fallbacks': 0}
+
+    def _mark_down(self):
+        with self._lock:
+            self._down_until = time.monotonic() + REPLICA_RETRY_S
+            self._lag_s = None
+            self._stats['fallbacks'] += 1
+
+    def _lag(self):
+        """
+        Retorna o atraso da réplica (s), medindo de novo se a última medição estiver velha.
+        """
+        with self._lock:
+            if time.monotonic() - self._checked_at < REPLICA_LAG_CHECK_S:
+                return self._lag_s
+        with get_pool("replica").connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(_REPLICA_LAG_QUERY)
+                lag_s = float(cursor.fetchone()['lag_s'])
+        with self._lock:
+            self._lag_s = lag_s
+            self._checked_at = time.monotonic()
+        return lag_s
+
+    def route(self):
+        """
+        Returns:
+            tuple[str, str]: Destino ('replica' ou 'primary') e o motivo da decisão.
+        """
+        if not replica_configured():
+            return 'primary', 'sem réplica configurada'
+        if time.monotonic() < self._down_until:
+            return 'primary', 'réplica indisponível'
+        try:
+            lag_s = self._lag()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError, PoolTimeout):
+            self._mark_down()
+            return 'primary', 'réplica indisponível'
+        if lag_s > self.max_lag_s:
+            return 'primary', f'réplica atrasada {lag_s:.1f}s'
+        return 'replica', f'atraso {lag_s:.1f}s'
+
+    def _record(self, target, reason):
+        with self._lock:
+            self._stats[target] += 1
+            self._decisions[current_report()] = {'destino': target, 'motivo': reason}
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Empresta uma conexão do destino escolhido por `route()`; se a conexão com a réplica
+        falhar no checkout, usa o primário.
+        """
+        target, reason = self.route()
+        with contextlib.ExitStack() as stack:
+            conn = None
+            if target == 'replica':
+                try:
+                    conn = stack.enter_context(get_pool("replica").connection())
+                except (psycopg2.OperationalError, psycopg2.InterfaceError, PoolTimeout):
+                    self._mark_down()
+                    target, reason = 'primary', 'réplica indisponível'
+            if conn is None:
+                conn = stack.enter_context(get_pool().connection())
+            self._record(target, reason)
+            yield conn
+
+    def stats(self):
+        """
+        Returns:
+            dict: Conexões por destino, quedas da réplica, último atraso medido e a última decisão por relatório.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['lag_s'] = self._lag_s
+            stats['max_lag_s'] = self.max_lag_s
+            stats['replica_down'] = time.monotonic() < self._down_until
+            stats['decisions'] = {name: dict(decision) for name, decision in self._decisions.items()}
+        return stats
+
+
+_replica_router = ReplicaRouter()
+
+
+def get_replica_router():
+    return _replica_router
+
+
+def get_connection():
+    """
+    Retorna um context manager que empresta uma conexão exclusiva do pool:
+
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                ...
+    """
+    return get_pool().connection()
+
+
+def get_report_connection():
+    """
+    Como get_connection, mas para as leituras dos relatórios: usa a réplica de leitura
+    quando ela estiver configurada, acessível e em dia (ver ReplicaRouter).
+    """
+    return _replica_router.connection()
+
+
+if __name__ == "__main__":
+    # Diagnóstico do roteamento (ex.: com dois Postgres locais, primário e réplica)
+    with get_report_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT inet_server_port() AS port, pg_is_in_recovery() AS in_recovery")
+            print(dict(cursor.fetchone()))
+    print(get_replica_router().stats())
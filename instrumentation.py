@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import logging
+import functools
+import threading
+import contextlib
+from collections import defaultdict, deque
+import numpy as np
+import pandas as pd
+
+# Calcula o tamanho (bytes) da especificação de cada gráfico; serializar o gráfico tem custo próprio
+MEASURE_CHART_PAYLOAD = os.environ.get("CLUB_MEASURE_CHART_PAYLOAD", "0") == "1"
+
+# Registra cada medição como uma linha JSON no logger "club.metrics"
+LOG_METRICS = os.environ.get("CLUB_METRICS_LOG", "0") == "1"
+
+# Arquivo no formato texto do Prometheus (ex.: para o textfile collector do node_exporter)
+METRICS_TEXTFILE = os.environ.get("CLUB_METRICS_TEXTFILE")
+
+# Quantidade de medições guardadas por (tipo, nome) para os percentis
+SAMPLES_PER_METRIC = 500
+
+logger = logging.getLogger("club.metrics")
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=SAMPLES_PER_METRIC))
+_counters = defaultdict(lambda: {'count': 0, 'sum': 0.0, 'rows': 0, 'bytes': 0})
+_runs = {}
+_local = threading.local()
+
+
+def _session_id():
+    # Fora do app (batch_reports e seus processos, benchmark) o Streamlit nem é carregado:
+    # importá-lo aqui mudaria a origem das configurações (ver settings._secrets)
+    if "streamlit" not in sys.modules:
+        return None
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    # Threads sem rerun (aquecimento, workers dos relatórios) medem sem sessão; sem o aviso
+    # "missing ScriptRunContext" a cada medição
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+def record(kind, name, duration, rows=None, nbytes=None):
+    """
+    Registra uma medição.
+
+    Args:
+        kind (str): Etapa medida: 'sql', 'pandas', 'chart' ou 'render'.
+        name (str): Relatório, gráfico ou seção.
+        duration (float): Duração em segundos.
+        rows (int): Linhas processadas, quando aplicável.
+        nbytes (int): Bytes transferidos ou gerados, quando aplicável.
+    """
+    event = {'kind': kind, 'name': name, 'duration_s': duration, 'rows': rows, 'bytes': nbytes}
+    with _lock:
+        _samples[(kind, name)].append(duration)
+        counter = _counters[(kind, name)]
+        counter['count'] += 1
+        counter['sum'] += duration
+        counter['rows'] += rows or 0
+        counter['bytes'] += nbytes or 0
+        session = _session_id()
+        if session in _runs:
+            _runs[session].append(event)
+    if LOG_METRICS:
+        logger.info(json.dumps(event))
+
+
+class _Timing:
+    """Medição em andamento; `rows` e `nbytes` podem ser preenchidos dentro do bloco."""
+
+    def __init__(self):
+        self.rows = None
+        self.nbytes = None
+
+
+@contextlib.contextmanager
+def timed(kind, name):
+    """
+    Mede a duração do bloco `with` e a registra ao final:
+
+        with timed('pandas', 'get_club_data') as timing:
+            ...
+            timing.rows = len(df)
+    """
+    timing = _Timing()
+    started = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        record(kind, name, time.perf_counter() - started, timing.rows, timing.nbytes)
+
+
+@contextlib.contextmanager
+def report_span(name):
+    """
+    Marca a thread atual como executando o relatório `name`, para que as consultas
+    feitas pelo cursor instrumentado sejam atribuídas a ele.
+    """
+    previous = getattr(_local, 'report', None)
+    _local.report = name
+    try:
+        yield
+    finally:
+        _local.report = previous
+
+
+def current_report():
+    return getattr(_local, 'report', None) or 'sql'
+
+
+def timed_chart(builder):
+    """
+    Decorador para as funções create_*_chart: mede a construção do gráfico e,
+    com CLUB_MEASURE_CHART_PAYLOAD=1, o tamanho da especificação gerada.
+    """
+    @functools.wraps(builder)
+    def wrapper(*args, **kwargs):
+        with timed('chart', builder.__name__) as timing:
+            chart = builder(*args, **kwargs)
+            if args and isinstance(args[0], pd.DataFrame):
+                timing.rows = len(args[0])
+            if MEASURE_CHART_PAYLOAD:
+                timing.nbytes = len(chart.to_json())
+        return chart
+    return wrapper
+
+
+def start_run():
+    """
+    Inicia a coleta das medições do rerun atual da sessão (usada pelo painel de depuração).
+    """
+    with _lock:
+        _runs[_session_id()] = []
+
+
+def finish_run():
+    """
+    Encerra a coleta do rerun atual e exporta as métricas acumuladas.
+
+    Returns:
+        pd.DataFrame: Medições do rerun, uma por linha.
+    """
+    with _lock:
+        events = _runs.pop(_session_id(), [])
+    if METRICS_TEXTFILE:
+        write_prometheus_textfile(METRICS_TEXTFILE)
+    return pd.DataFrame(events, columns=['kind', 'name', 'duration_s', 'rows', 'bytes'])
+
+
+def summary():
+    """
+    Returns:
+        pd.DataFrame: Por (tipo, nome): quantidade, p50 e p95 da duração, média de linhas e de bytes.
+    """
+    with _lock:
+        items = [(key, np.array(samples), dict(_counters[key])) for key, samples in _samples.items()]
+    rows = [
+        {
+            'kind': kind,
+            'name': name,
+            'count': counter['count'],
+            'p50_s': float(np.percentile(samples, 50)),
+            'p95_s': float(np.percentile(samples, 95)),
+            'avg_rows': counter['rows'] / counter['count'],
+            'avg_bytes': counter['bytes'] / counter['count'],
+        }
+        for (kind, name), samples, counter in items
+    ]
+    return pd.DataFrame(rows, columns=['kind', 'name', 'count', 'p50_s', 'p95_s', 'avg_rows', 'avg_bytes'])
+
+
+def render_prometheus():
+    """
+    Exporta as métricas no formato texto do Prometheus (summary com quantis 0.5 e 0.95).
+    """
+    lines = [
+        "# HELP club_report_duration_seconds Duração das etapas dos relatórios.",
+        "# TYPE club_report_duration_seconds summary",
+    ]
+    with _lock:
+        items = [(key, np.array(samples), dict(_counters[key])) for key, samples in _samples.items()]
+    for (kind, name), samples, counter in items:
+        labels = f'kind="{kind}",name="{name}"'
+        for quantile in (0.5, 0.95):
+            value = float(np.percentile(samples, quantile * 100))
+            lines.append(f'club_report_duration_seconds{{{labels},quantile="{quantile}"}} {value:.6f}')
+        lines.append(f'club_report_duration_seconds_sum{{{labels}}} {counter["sum"]:.6f}')
+        lines.append(f'club_report_duration_seconds_count{{{labels}}} {counter["count"]}')
+    lines.append("# HELP club_report_rows_total Linhas processadas pelas etapas dos relatórios.")
+    lines.append("# TYPE club_report_rows_total counter")
+    for (kind, name), _, counter in items:
+        lines.append(f'club_report_rows_total{{kind="{kind}",name="{name}"}} {counter["rows"]}')
+    lines.append("# HELP club_report_bytes_total Bytes transferidos ou gerados pelas etapas dos relatórios.")
+    lines.append("# TYPE club_report_bytes_total counter")
+    for (kind, name), _, counter in items:
+        lines.append(f'club_report_bytes_total{{kind="{kind}",name="{name}"}} {counter["bytes"]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_textfile(path):
+    """
+    Grava as métricas em `path` de forma atômica (arquivo temporário + rename).
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
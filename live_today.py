@@ -0,0 +1,104 @@
+import os
+import time
+import datetime
+import threading
+from get_connection import get_report_connection
+from fetch_frame import iter_frames
+from report_queries import report_filters, sale_date_params
+from sale_facts import SALE_FACTS_DTYPES, SALE_FACTS_SINCE_QUERY, SaleFactsAccumulator
+
+# Intervalo, em segundos, entre as verificações de vendas novas no modo ao vivo
+LIVE_REFRESH_S = float(os.environ.get("CLUB_LIVE_REFRESH_S", "30"))
+
+# Vendas abaixo da marca d'água rebuscadas a cada verificação, para pegar as que foram
+# confirmadas fora de ordem de ID; as já contadas são ignoradas
+LIVE_ID_OVERLAP = 500
+
+
+class LiveDay:
+    """
+    Fatos do dia de hoje mantidos em memória e atualizados por delta.
+
+    Guarda a marca d'água (maior SALES.ID já visto) e, a cada `poll()`, busca apenas as
+    vendas de hoje acima dela, somando-as aos consolidados do dia (SaleFactsAccumulator).
+    Na virada do dia o estado é reiniciado.
+    """
+
+    def __init__(self, store_ids):
+        self.store_ids = list(store_ids)
+        self._lock = threading.Lock()
+        self._reset(datetime.date.today())
+
+    def _reset(self, day):
+        self.day = day
+        self.watermark = 0
+        self.version = 0
+        self.last_poll = 0.0
+        self._seen = set()
+        self._facts = SaleFactsAccumulator()
+        self._result = self._facts.result()
+
+    def poll(self, min_interval=0.0):
+        """
+        Busca as vendas novas de hoje, se a última verificação tiver mais de `min_interval` segundos.
+
+        Returns:
+            int: Quantidade de vendas novas incorporadas.
+        """
+        with self._lock:
+            today = datetime.date.today()
+            if today != self.day:
+                self._reset(today)
+            if time.monotonic() - self.last_poll < min_interval:
+                return 0
+
+            new_sales = 0
+            with get_report_connection() as conn:
+                for chunk in iter_frames(
+                    conn,
+                    SALE_FACTS_SINCE_QUERY,
+                    (self.store_ids, *sale_date_params(today, today), max(self.watermark - LIVE_ID_OVERLAP, 0)),
+                    SALE_FACTS_DTYPES,
+                    date_columns=('data_venda',),
+                ):
+                    chunk = chunk[~chunk['sale_id'].isin(self._seen)]
+                    if chunk.empty:
+                        continue
+                    self._facts.add(chunk)
+                    self._seen.update(chunk['sale_id'].tolist())
+                    self.watermark = max(self.watermark, int(chunk['sale_id'].max()))
+                    new_sales += len(chunk)
+            # Vendas abaixo da janela de sobreposição não são mais rebuscadas
+            self._seen = {sale_id for sale_id in self._seen if sale_id > self.watermark - LIVE_ID_OVERLAP}
+
+            self.last_poll = time.monotonic()
+            if new_sales:
+                self.version += 1
+                self._result = self._facts.result()
+            return new_sales
+
+    def facts(self):
+        """
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: Fatos consolidados de hoje, no formato de read_sale_facts.
+        """
+        with self._lock:
+            return self._result
+
+
+_live_days = {}
+_live_lock = threading.Lock()
+
+
+def get_live_day(store_ids=None):
+    """
+    Retorna o LiveDay do processo para as lojas (compartilhado por todas as sessões, de
+    modo que vários painéis abertos fazem uma única verificação por intervalo).
+    """
+    store_ids, _ = report_filters(store_ids)
+    key = tuple(sorted(store_ids))
+    with _live_lock:
+        if key not in _live_days:
+            _live_days[key] = LiveDay(key)
+        return _live_days[key]
+
@@ -0,0 +1,8 @@
+-- Índices de apoio às consultas de relatório (CPF Club, vendas por atendente e itens).
+-- CONCURRENTLY não bloqueia as gravações do PDV, mas não pode rodar dentro de uma transação:
+--     psql "$DATABASE_URL" -f migrations/001_report_indexes.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sales_cash_history_id ON sales (cash_history_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sales_created_at ON sales (created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cash_history_store_id ON cash_history (store_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sale_items_sale_id ON sale_items (sale_id);
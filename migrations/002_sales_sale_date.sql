@@ -0,0 +1,53 @@
+-- Opcional: coluna armazenada com a data da venda, indexada.
+-- Depois de aplicar (e de o backfill terminar), habilite o uso nas consultas com CLUB_USE_SALE_DATE_COLUMN=1.
+--     psql "$DATABASE_URL" -f migrations/002_sales_sale_date.sql
+--
+-- ATENÇÃO, BLOQUEIOS: não use uma coluna GENERATED ... STORED nem uma com DEFAULT calculado aqui.
+-- Os dois reescrevem a tabela SALES inteira sob ACCESS EXCLUSIVE e param as vendas do PDV durante
+-- a reescrita. Este script faz, em vez disso:
+--   1. ADD COLUMN anulável: só altera o catálogo. Ainda pede ACCESS EXCLUSIVE por um instante,
+--      então o lock_timeout evita que ele fique na fila atrás de uma transação longa e trave o PDV
+--      (se expirar, rode de novo);
+--   2. um gatilho que preenche a coluna nas vendas novas ou alteradas;
+--   3. o preenchimento do histórico em lotes, um COMMIT por lote (bloqueia só as linhas de cada lote);
+--   4. o índice com CONCURRENTLY.
+-- Mesmo assim o backfill gera escrita e WAL proporcionais ao tamanho de SALES: rode fora do horário
+-- de pico ou numa janela de manutenção, acompanhando o atraso das réplicas.
+--
+-- Com CREATED_AT timestamptz, a data segue o TimeZone da sessão que grava; prefira timestamp sem fuso.
+
+SET lock_timeout = '5s';
+ALTER TABLE sales ADD COLUMN IF NOT EXISTS sale_date date;
+RESET lock_timeout;
+
+CREATE OR REPLACE FUNCTION sales_set_sale_date() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.sale_date := NEW.created_at::date;
+    RETURN NEW;
+END $$;
+
+DROP TRIGGER IF EXISTS trg_sales_sale_date ON sales;
+CREATE TRIGGER trg_sales_sale_date
+    BEFORE INSERT OR UPDATE OF created_at ON sales
+    FOR EACH ROW EXECUTE FUNCTION sales_set_sale_date();
+
+-- Histórico em lotes de IDs. As vendas acima do MAX(id) lido no início já passam pelo gatilho
+CREATE OR REPLACE PROCEDURE backfill_sales_sale_date(batch_size integer DEFAULT 50000)
+LANGUAGE plpgsql AS $$
+DECLARE
+    last_id bigint := 0;
+    max_id bigint;
+BEGIN
+    SELECT COALESCE(MAX(id), 0) INTO max_id FROM sales;
+    WHILE last_id < max_id LOOP
+        UPDATE sales SET sale_date = created_at::date
+        WHERE id > last_id AND id <= last_id + batch_size AND sale_date IS NULL;
+        last_id := last_id + batch_size;
+        COMMIT;
+    END LOOP;
+END $$;
+
+CALL backfill_sales_sale_date();
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sales_sale_date ON sales (sale_date);
@@ -0,0 +1,30 @@
+-- Tabelas de agregados diários para os relatórios, mantidas por `python rollups.py refresh`
+-- e preenchidas com o histórico por `python rollups.py backfill --start ... --end ...`.
+--     psql "$DATABASE_URL" -f migrations/003_report_rollups.sql
+
+-- Vendas por (loja, dia, vendedor)
+CREATE TABLE IF NOT EXISTS report_rollup_seller_day (
+    store_id integer NOT NULL,
+    sale_date date NOT NULL,
+    opened_by integer NOT NULL,
+    vendas_totais integer NOT NULL,
+    qty_cpf_club integer NOT NULL,
+    itens_n_buffet integer NOT NULL,
+    PRIMARY KEY (store_id, sale_date, opened_by)
+);
+
+-- Itens não-buffet por (loja, dia, vendedor, item)
+CREATE TABLE IF NOT EXISTS report_rollup_seller_item_day (
+    store_id integer NOT NULL,
+    sale_date date NOT NULL,
+    opened_by integer NOT NULL,
+    item text NOT NULL,
+    vendas_totais integer NOT NULL,
+    PRIMARY KEY (store_id, sale_date, opened_by, item)
+);
+
+-- Última marca (timestamp de alteração em SALES) já processada por refresh
+CREATE TABLE IF NOT EXISTS report_rollup_watermark (
+    name text PRIMARY KEY,
+    watermark timestamp NOT NULL
+);
@@ -0,0 +1,33 @@
+import pandas as pd
+
+
+def chain_club_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Consolida os dados diários de CPF Clube (get_club_data) em uma visão da rede:
+    uma linha por loja com os totais do período, ordenada pelo % CPF Clube, mais o total da rede.
+
+    Args:
+        df (pd.DataFrame): DataFrame retornado por get_club_data, com a coluna 'Loja'.
+
+    Returns:
+        pd.DataFrame: Colunas ['Loja', 'Vendas Totais', 'Qtd. CPF Clube', '% CPF Clube'].
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    df_stores = df.groupby('Loja', as_index=False).agg(
+        **{
+            'Vendas Totais': ('Vendas Totais (Dia)', 'sum'),
+            'Qtd. CPF Clube': ('Qtd. CPF Clube (Dia)', 'sum'),
+        }
+    )
+    df_stores = df_stores.astype({'Loja': 'object'})
+    df_stores.loc[len(df_stores)] = ['Rede', df_stores['Vendas Totais'].sum(), df_stores['Qtd. CPF Clube'].sum()]
+    df_stores['% CPF Clube'] = round((df_stores['Qtd. CPF Clube'] / df_stores['Vendas Totais']) * 100, 2)
+
+    # Lojas ordenadas pelo percentual, com a linha da rede no final
+    is_chain = df_stores['Loja'] == 'Rede'
+    return pd.concat(
+        [df_stores[~is_chain].sort_values('% CPF Clube', ascending=False), df_stores[is_chain]],
+        ignore_index=True,
+    )
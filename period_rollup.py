@@ -0,0 +1,173 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Granularidades suportadas, pelo rótulo usado no app
+GRANULARITIES = {
+    'Dia': 'day',
+    'Semana': 'week',
+    'Mês': 'month',
+}
+
+# Quantidade de motores mantidos em memória por rollup_engine_for
+_ENGINE_CACHE_SIZE = 8
+_engine_cache = OrderedDict()
+_engine_lock = threading.Lock()
+
+
+class PeriodRollup:
+    """
+    Motor de consolidação dos dados diários de CPF Clube (get_club_data) por período.
+
+    Os dados são convertidos uma única vez em arrays de inteiros (dia desde 1970-01-01,
+    código do vendedor e da loja) e de contagens; cada granularidade é então calculada
+    com `np.bincount` sobre códigos inteiros, produzindo os níveis por vendedor e total
+    da loja na mesma passada. O DataFrame de entrada não é alterado e os resultados
+    ficam memorizados por granularidade.
+    """
+
+    def __init__(self, df_daily: pd.DataFrame):
+        self.empty = df_daily.empty
+        self._cache = {}
+        if self.empty:
+            return
+
+        self._has_store = 'Loja' in df_daily.columns
+        self._days = pd.to_datetime(df_daily['Data da Venda']).to_numpy().astype('datetime64[D]').astype('int64')
+
+        seller_keys = ['Loja', 'Vendedor'] if self._has_store else ['Vendedor']
+        self._seller_codes, self._sellers = pd.MultiIndex.from_frame(df_daily[seller_keys]).factorize()
+        if self._has_store:
+            self._store_codes, self._stores = pd.factorize(df_daily['Loja'])
+        else:
+            self._store_codes, self._stores = np.zeros(len(df_daily), dtype='int64'), pd.Index([None])
+
+        self._sales = df_daily['Vendas Totais (Dia)'].to_numpy(dtype='float64')
+        self._cpf = df_daily['Qtd. CPF Clube (Dia)'].to_numpy(dtype='float64')
+
+    def _period_bounds(self, granularity, bounds):
+        """
+        Retorna, para cada linha, o primeiro e o último dia (inteiros) do seu período.
+        """
+        days = self._days
+        if granularity == 'day':
+            return days, days
+        if granularity == 'week':
+            # 1970-01-01 foi uma quinta-feira: (dia + 3) % 7 é o dia da semana ISO (segunda = 0)
+            start = days - (days + 3) % 7
+            return start, start + 6
+        if granularity == 'month':
+            months = days.astype('datetime64[D]').astype('datetime64[M]')
+            start = months.astype('datetime64[D]').astype('int64')
+            end = (months + 1).astype('datetime64[D]').astype('int64') - 1
+            return start, end
+        if granularity == 'custom':
+            # Períodos personalizados: `bounds` são as datas de início de cada período, em ordem
+            starts = np.asarray(pd.to_datetime(list(bounds)).to_numpy().astype('datetime64[D]').astype('int64'))
+            index = np.searchsorted(starts, days, side='right') - 1
+            if (index < 0).any():
+                raise ValueError("Há dias anteriores ao início do primeiro período personalizado.")
+            ends = np.append(starts[1:] - 1, max(days.max(), starts[-1]))
+            return starts[index], ends[index]
+        raise ValueError(f"Granularidade desconhecida: {granularity}")
+
+    def _aggregate(self, period_codes, group_codes, n_groups):
+        """
+        Soma vendas e CPF Clube por (período, grupo) com bincount sobre uma chave inteira composta.
+        """
+        key = period_codes * n_groups + group_codes
+        size = (period_codes.max() + 1) * n_groups
+        present = np.bincount(key, minlength=size) > 0
+        sales = np.bincount(key, weights=self._sales, minlength=size)[present]
+        cpf = np.bincount(key, weights=self._cpf, minlength=size)[present]
+        flat = np.flatnonzero(present)
+        return flat // n_groups, flat % n_groups, sales, cpf
+
+    @staticmethod
+    def _as_dates(day_numbers):
+        return pd.to_datetime(day_numbers.astype('datetime64[D]')).date
+
+    def rollup(self, granularity='week', bounds=None):
+        """
+        Consolida os dados na granularidade pedida.
+
+        Args:
+            granularity (str): 'day', 'week' (semana ISO), 'month' ou 'custom'.
+            bounds (list[datetime.date]): Datas de início dos períodos, quando `granularity='custom'`.
+
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: Consolidado por vendedor e total da loja, com as colunas
+            ['Início do Período', 'Fim do Período', ('Loja',) ('Vendedor',) 'Vendas Totais',
+            'Qtd. CPF Clube', '% CPF Clube'].
+        """
+        cache_key = (granularity, tuple(bounds) if bounds is not None else None)
+        if cache_key in self._cache:
+            return self._cache[cache_key]
+        if self.empty:
+            return pd.DataFrame(), pd.DataFrame()
+
+        start, end = self._period_bounds(granularity, bounds)
+        period_codes, period_starts = pd.factorize(start, sort=True)
+        period_ends = pd.Series(end).groupby(period_codes).first().to_numpy()
+
+        # Nível por vendedor
+        period, seller, sales, cpf = self._aggregate(period_codes, self._seller_codes, len(self._sellers))
+        df_seller = pd.DataFrame({
+            'Início do Período': self._as_dates(period_starts[period]),
+            'Fim do Período': self._as_dates(period_ends[period]),
+        })
+        sellers = self._sellers[seller]
+        if self._has_store:
+            df_seller['Loja'] = sellers.get_level_values(0)
+        df_seller['Vendedor'] = sellers.get_level_values(-1)
+        df_seller['Vendas Totais'] = sales
+        df_seller['Qtd. CPF Clube'] = cpf
+        df_seller['% CPF Clube'] = np.round((cpf / sales) * 100, 2)
+        seller_order = (['Loja'] if self._has_store else []) + ['Vendedor', 'Início do Período']
+        df_seller = df_seller.sort_values(seller_order, kind='stable').reset_index(drop=True)
+
+        # Nível total da loja
+        period, store, sales, cpf = self._aggregate(period_codes, self._store_codes, len(self._stores))
+        df_total = pd.DataFrame({
+            'Início do Período': self._as_dates(period_starts[period]),
+            'Fim do Período': self._as_dates(period_ends[period]),
+        })
+        if self._has_store:
+            df_total['Loja'] = self._stores[store]
+        df_total['Vendas Totais'] = sales
+        df_total['Qtd. CPF Clube'] = cpf
+        df_total['% CPF Clube'] = np.round((cpf / sales) * 100, 2)
+        total_order = (['Loja'] if self._has_store else []) + ['Início do Período']
+        df_total = df_total.sort_values(total_order, kind='stable').reset_index(drop=True)
+
+        self._cache[cache_key] = (df_seller, df_total)
+        return df_seller, df_total
+
+
+def frame_fingerprint(df: pd.DataFrame):
+    """
+    Impressão digital do conteúdo do DataFrame, usada para reaproveitar o motor entre reruns.
+    """
+    return (tuple(df.columns), len(df), int(pd.util.hash_pandas_object(df, index=False).sum()))
+
+
+def rollup_engine_for(df_daily: pd.DataFrame) -> PeriodRollup:
+    """
+    Retorna um PeriodRollup para os dados, reaproveitando o mesmo motor (e seus
+    resultados já calculados) quando o conteúdo não mudou, por exemplo quando
+    apenas a granularidade escolhida no app foi alterada.
+    """
+    key = frame_fingerprint(df_daily)
+    with _engine_lock:
+        engine = _engine_cache.get(key)
+        if engine is not None:
+            _engine_cache.move_to_end(key)
+            return engine
+
+    engine = PeriodRollup(df_daily)
+    with _engine_lock:
+        _engine_cache[key] = engine
+        while len(_engine_cache) > _ENGINE_CACHE_SIZE:
+            _engine_cache.popitem(last=False)
+    return engine
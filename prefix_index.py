@@ -0,0 +1,133 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from period_rollup import frame_fingerprint
+
+# Quantidade de índices mantidos em memória por prefix_index_for
+_INDEX_CACHE_SIZE = 8
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+
+
+class PrefixSumIndex:
+    """
+    Índice de somas prefixadas por chave (ex.: loja e vendedor) sobre os dias da janela carregada.
+
+    Para cada chave e medida guarda `prefix[dia] = soma dos dias anteriores`, em um array
+    NumPy (chaves x dias + 1 x medidas); o total de qualquer subperíodo da janela sai de
+    `prefix[fim + 1] - prefix[início]`, em O(1) por chave e sem consultar o banco.
+    """
+
+    def __init__(self, df: pd.DataFrame, date_column, keys, measures):
+        """
+        Args:
+            df (pd.DataFrame): Dados diários, uma linha por chave e dia.
+            date_column (str): Coluna de data (date ou datetime64).
+            keys (list[str]): Colunas que identificam a chave (ex.: ['Loja', 'Vendedor']).
+            measures (list[str]): Colunas de contagem somadas no índice.
+        """
+        self.keys = list(keys)
+        self.measures = list(measures)
+        self.empty = df.empty
+        if self.empty:
+            return
+
+        days = pd.to_datetime(df[date_column]).to_numpy().astype('datetime64[D]')
+        self.first_day = days.min()
+        self.last_day = days.max()
+        day_codes = (days - self.first_day).astype('int64')
+        n_days = int(day_codes.max()) + 1
+
+        key_codes, self._key_values = pd.MultiIndex.from_frame(df[self.keys]).factorize()
+        n_keys = len(self._key_values)
+
+        # Somas diárias densas por (chave, dia) e, depois, acumuladas ao longo dos dias
+        flat = key_codes * n_days + day_codes
+        daily = np.stack(
+            [
+                np.bincount(flat, weights=df[col].to_numpy(dtype='float64'), minlength=n_keys * n_days)
+                for col in self.measures
+            ],
+            axis=-1,
+        ).reshape(n_keys, n_days, len(self.measures))
+        self._prefix = np.zeros((n_keys, n_days + 1, len(self.measures)))
+        np.cumsum(daily, axis=1, out=self._prefix[:, 1:])
+
+    def _day_code(self, day):
+        return int((np.datetime64(pd.Timestamp(day).date(), 'D') - self.first_day).astype('int64'))
+
+    def totals(self, start_date, end_date) -> pd.DataFrame:
+        """
+        Soma as medidas de cada chave no período [start_date, end_date], limitado à janela carregada.
+
+        Returns:
+            pd.DataFrame: Colunas `keys` + `measures`, apenas para as chaves com movimento no período.
+        """
+        if self.empty:
+            return pd.DataFrame(columns=self.keys + self.measures)
+        n_days = self._prefix.shape[1] - 1
+        start = min(max(self._day_code(start_date), 0), n_days)
+        end = min(max(self._day_code(end_date) + 1, 0), n_days)
+        sums = self._prefix[:, max(end, start)] - self._prefix[:, start]
+
+        df = self._key_values.to_frame(index=False, name=self.keys)
+        df[self.measures] = sums
+        return df[sums.any(axis=1)].reset_index(drop=True)
+
+    def ratio(self, start_date, end_date, numerator, denominator, name, by=None) -> pd.DataFrame:
+        """
+        Percentual `numerator / denominator` de cada chave no período (equivale ao acumulado no último dia).
+
+        Args:
+            numerator (str): Medida do numerador (ex.: 'Qtd. CPF Clube (Dia)').
+            denominator (str): Medida do denominador (ex.: 'Vendas Totais (Dia)').
+            name (str): Nome da coluna de percentual no resultado.
+            by (list[str]): Reagrupa as chaves antes do percentual (ex.: ['Vendedor'] para somar as lojas).
+
+        Returns:
+            pd.DataFrame: Colunas `by` (ou `keys`), as duas medidas e `name`, arredondado a 2 casas.
+        """
+        df = self.totals(start_date, end_date)
+        if by is not None:
+            df = df.groupby(by, as_index=False, observed=True)[self.measures].sum()
+        df[name] = ((df[numerator] / df[denominator].replace(0, np.nan)) * 100).round(2)
+        return df
+
+    def compare(self, period_a, period_b, numerator, denominator, by=None) -> pd.DataFrame:
+        """
+        Compara o percentual de cada chave em dois períodos da janela.
+
+        Args:
+            period_a (tuple[datetime.date, datetime.date]): Primeiro período.
+            period_b (tuple[datetime.date, datetime.date]): Segundo período.
+
+        Returns:
+            pd.DataFrame: Colunas `by` (ou `keys`), '% Período A', '% Período B' e 'Diferença (p.p.)'.
+        """
+        keys = by or self.keys
+        a = self.ratio(*period_a, numerator, denominator, '% Período A', by)[keys + ['% Período A']]
+        b = self.ratio(*period_b, numerator, denominator, '% Período B', by)[keys + ['% Período B']]
+        df = a.merge(b, on=keys, how='outer')
+        df['Diferença (p.p.)'] = (df['% Período B'] - df['% Período A']).round(2)
+        return df.sort_values('Diferença (p.p.)', ascending=False, na_position='last').reset_index(drop=True)
+
+
+def prefix_index_for(df: pd.DataFrame, date_column, keys, measures) -> PrefixSumIndex:
+    """
+    Retorna um PrefixSumIndex para os dados, reaproveitando o mesmo índice entre reruns
+    enquanto o conteúdo não mudar (ex.: quando apenas o recorte escolhido no app mudou).
+    """
+    cache_key = (frame_fingerprint(df), date_column, tuple(keys), tuple(measures))
+    with _index_lock:
+        index = _index_cache.get(cache_key)
+        if index is not None:
+            _index_cache.move_to_end(cache_key)
+            return index
+
+    index = PrefixSumIndex(df, date_column, keys, measures)
+    with _index_lock:
+        _index_cache[cache_key] = index
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
@@ -1,44 +1,150 @@
-import pandas as pd
-from get_connection import get_connection
+from get_connection import get_report_connection
+from fetch_frame import fetch_frame
 import datetime
+from user_directory import attach_seller_names, excluded_seller_ids
+from report_queries import (
+    OTHER_ITEMS_LABEL,
+    TOP_ITEMS,
+    TOP_ITEMS_PER_SELLER,
+    USE_ROLLUPS,
+    date_range_predicate,
+    report_filters,
+    sale_date_predicate,
+    sale_date_params,
+)
 
-def read_sale_items_not_buffet(start_date, end_date):
+# Só o id do atendente é retornado; o nome é anexado no cliente (user_directory)
+SALE_ITEMS_NOT_BUFFET_QUERY = f"""
+    SELECT 
+        CH.STORE_ID AS store_id, 
+        SI.NAME AS item, 
+        CH.OPENED_BY AS opened_by,
+        COUNT(1) AS vendas_totais
+    FROM CASH_HISTORY CH  
+    INNER JOIN SALES S ON S.CASH_HISTORY_ID = CH.ID 
+    INNER JOIN SALE_ITEMS SI ON SI.SALE_ID = S.ID 
+    WHERE CH.STORE_ID = ANY(%s)
+        AND SI.NAME <> 'self-service'
+        AND {sale_date_predicate()}
+        AND S.ABSTRACT_SALE = FALSE
+        AND S.TYPE = 0 
+        AND CH.OPENED_BY <> ALL(%s)
+    GROUP BY CH.STORE_ID, SI.NAME, CH.OPENED_BY
+"""
+
+# Mesmos dados lidos da tabela de agregados diários por item (migrations/003_report_rollups.sql)
+ROLLUP_SALE_ITEMS_NOT_BUFFET_QUERY = f"""
+    SELECT 
+        R.STORE_ID AS store_id, 
+        R.ITEM AS item, 
+        R.OPENED_BY AS opened_by,
+        SUM(R.VENDAS_TOTAIS) AS vendas_totais
+    FROM REPORT_ROLLUP_SELLER_ITEM_DAY R
+    WHERE R.STORE_ID = ANY(%s)
+        AND {date_range_predicate("R.SALE_DATE")}
+        AND R.OPENED_BY <> ALL(%s)
+    GROUP BY R.STORE_ID, R.ITEM, R.OPENED_BY
+"""
+
+# Mantém os `top` itens mais vendidos no geral e os `top_per_seller` de cada atendente,
+# somando os demais em um único item por (loja, atendente); `{base}` é uma das consultas acima
+TOP_ITEMS_QUERY = """
+    WITH base AS ({base}),
+    ranked AS (
+        SELECT
+            store_id,
+            item,
+            opened_by,
+            vendas_totais,
+            DENSE_RANK() OVER (ORDER BY item_total DESC, item) AS item_rank,
+            ROW_NUMBER() OVER (PARTITION BY opened_by ORDER BY vendas_totais DESC, item) AS seller_rank
+        FROM (
+            SELECT base.*, SUM(vendas_totais) OVER (PARTITION BY item) AS item_total
+            FROM base
+        ) totals
+    )
+    SELECT
+        store_id,
+        CASE WHEN item_rank <= %s OR seller_rank <= %s THEN item ELSE %s END AS item,
+        opened_by,
+        SUM(vendas_totais) AS vendas_totais
+    FROM ranked
+    GROUP BY 1, 2, 3
+"""
+
+def read_sale_items_not_buffet(start_date, end_date, store_ids=None, excluded_sellers=(), top=None, top_per_seller=None):
     """
-    Busca dados de vendas não-buffet por item e atendente no período informado.
+    Busca dados de vendas não-buffet por loja, item e atendente no período informado.
+
+    Com limites de itens, o ranking é feito no banco e a cauda vem somada em
+    OTHER_ITEMS_LABEL, de modo que o resultado não cresce com o cardápio.
     
     Args:
-        start_date (str): Data inicial no formato 'YYYY-MM-DD'.
-        end_date (str): Data final no formato 'YYYY-MM-DD'.
+        start_date (datetime.date): Data inicial do período.
+        end_date (datetime.date): Data final do período.
+        store_ids (list[int]): Lojas a consultar (padrão: DEFAULT_STORE_IDS).
+        excluded_sellers (list[str]): Atendentes a ignorar (padrão: nenhum).
+        top (int): Itens mais vendidos no geral mantidos (padrão: TOP_ITEMS; 0 mantém todos).
+        top_per_seller (int): Itens mais vendidos de cada atendente mantidos (padrão: TOP_ITEMS_PER_SELLER).
 
     Returns:
-        pd.DataFrame: DataFrame com Nome do Item, Atendente e Vendas Totais.
+        pd.DataFrame: DataFrame com Loja, Nome do Item, Atendente e Vendas Totais.
     """
-    query = """
-        SELECT 
-            SI.NAME AS item, 
-            MAX(U.NAME) AS atendente,
-            COUNT(1) AS vendas_totais
-        FROM CASH_HISTORY CH  
-        INNER JOIN USER_THE_BEST U ON U.ID = CH.OPENED_BY 
-        INNER JOIN SALES S ON S.CASH_HISTORY_ID = CH.ID 
-        INNER JOIN SALE_ITEMS SI ON SI.SALE_ID = S.ID 
-        WHERE CH.STORE_ID = 467
-            AND SI.NAME <> 'self-service'
-            AND DATE(S.CREATED_AT) >= %s
-            AND DATE(S.CREATED_AT) <= %s
-            AND S.ABSTRACT_SALE = FALSE
-            AND S.TYPE = 0 
-        GROUP BY SI.NAME, U.NAME
+    store_ids, excluded_sellers = report_filters(store_ids, excluded_sellers)
+    top = TOP_ITEMS if top is None else top
+    top_per_seller = TOP_ITEMS_PER_SELLER if top_per_seller is None else top_per_seller
+
+    query = ROLLUP_SALE_ITEMS_NOT_BUFFET_QUERY if USE_ROLLUPS else SALE_ITEMS_NOT_BUFFET_QUERY
+    params = (store_ids, *sale_date_params(start_date, end_date), excluded_seller_ids(excluded_sellers))
+    if top > 0:
+        query = TOP_ITEMS_QUERY.format(base=query)
+        params = (*params, top, top_per_seller, OTHER_ITEMS_LABEL)
+
+    with get_report_connection() as conn:
+        df = fetch_frame(
+            conn,
+            query,
+            params,
+            {"store_id": "int64", "item": "object", "opened_by": "int64", "vendas_totais": "int64"},
+        )
+    df = attach_seller_names(df, 'atendente')
+    df["Vendas Totais"] = df["vendas_totais"]
+    return df
+
+
+def fold_top_items(df, top=None, top_per_seller=None):
     """
+    Mesma regra de TOP_ITEMS_QUERY aplicada a um resultado já carregado (ex.: derivado dos fatos por venda).
+
+    Args:
+        df (pd.DataFrame): Colunas ['store_id', 'item', 'atendente', 'vendas_totais', ...].
+        top (int): Itens mais vendidos no geral mantidos (padrão: TOP_ITEMS; 0 mantém todos).
+        top_per_seller (int): Itens mais vendidos de cada atendente mantidos (padrão: TOP_ITEMS_PER_SELLER).
 
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            cursor.execute(query, (start_date, end_date))
-            data = cursor.fetchall()
+    Returns:
+        pd.DataFrame: Mesmas colunas, com a cauda somada em OTHER_ITEMS_LABEL.
+    """
+    top = TOP_ITEMS if top is None else top
+    top_per_seller = TOP_ITEMS_PER_SELLER if top_per_seller is None else top_per_seller
+    if top <= 0 or df.empty:
+        return df
 
-            df = pd.DataFrame(data, columns=["item", "atendente", "vendas_totais"])
-            df["Vendas Totais"] = pd.to_numeric(df["vendas_totais"], errors="coerce")
-            return df
+    item_totals = df.groupby('item')['vendas_totais'].sum()
+    top_items = item_totals.sort_index().sort_values(ascending=False, kind='stable').index[:top]
+    seller_rank = (
+        df.sort_values(['vendas_totais', 'item'], ascending=[False, True])
+        .groupby('atendente', observed=True)
+        .cumcount()
+        .reindex(df.index)
+    )
+    keep = df['item'].isin(top_items) | (seller_rank < top_per_seller)
+    df = (
+        df.assign(item=df['item'].where(keep, OTHER_ITEMS_LABEL))
+        .groupby(['store_id', 'item', 'atendente'], as_index=False, observed=True)['vendas_totais']
+        .sum()
+    )
+    df["Vendas Totais"] = df["vendas_totais"]
+    return df
 
 
 #start_date = datetime.date(2025, 8, 1) # Primeiro dia de agosto de 2025
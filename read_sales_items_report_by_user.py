@@ -1,97 +1,147 @@
-import streamlit as st
 import pandas as pd
 from psycopg2.extras import RealDictCursor
 import datetime
 
-from get_connection import get_connection
+from get_connection import get_report_connection
+from fetch_frame import fetch_frame
+from instrumentation import timed
+from report_queries import USE_ROLLUPS, date_range_predicate, report_filters, sale_date_predicate, sale_date_params
+from user_directory import attach_seller_names, excluded_seller_ids
 
-def read_sales_items_report_by_user(start_date, end_date):
+# Os itens não-buffet são contados por venda via LATERAL, usando o índice em SALE_ITEMS(SALE_ID)
+# em vez de agrupar a tabela SALE_ITEMS inteira. Só o id do atendente é retornado: o nome é
+# anexado no cliente (user_directory), sem JOIN com USER_THE_BEST
+SALES_ITEMS_REPORT_QUERY = f"""
+SELECT 
+    a.store_id, 
+    a.opened_by, 
+    a.data_venda AS date, 
+    a.vendas_totais, 
+    a.itens_n_buffet, 
+    round( (a.itens_n_buffet::numeric / a.vendas_totais) * 100 , 2 ) AS perc_venda_itens, 
+    SUM(a.vendas_totais) OVER (PARTITION BY a.store_id, a.opened_by ORDER BY a.data_venda) AS vendas_totais_acumulado, 
+    SUM(a.itens_n_buffet) OVER (PARTITION BY a.store_id, a.opened_by ORDER BY a.data_venda) AS itens_n_buffet_acumulado,
+    round( (SUM(a.itens_n_buffet) OVER (PARTITION BY a.store_id, a.opened_by ORDER BY a.data_venda)::numeric / 
+    SUM(a.vendas_totais) OVER (PARTITION BY a.store_id, a.opened_by ORDER BY a.data_venda)) * 100 , 2 ) AS perc_venda_itens_acumulado 
+FROM ( 
+    SELECT  
+        CH.STORE_ID AS store_id, 
+        DATE(S.CREATED_AT) AS data_venda, 
+        COUNT(1) AS vendas_totais, 
+        CH.OPENED_BY AS opened_by,  
+        SUM(COALESCE(si.itens_n_buffet, 0)) AS itens_n_buffet
+    FROM CASH_HISTORY CH   
+    INNER JOIN SALES S ON S.CASH_HISTORY_ID = CH.ID  
+    LEFT JOIN LATERAL ( 
+        SELECT  
+            COUNT(1) AS itens_n_buffet
+        FROM sale_items si  
+        WHERE si.sale_id = s.id
+            AND si.name <> 'self-service' 
+    ) AS si ON TRUE  
+    WHERE 1=1 
+        AND CH.STORE_ID = ANY(%s) 
+        AND {sale_date_predicate()}
+        AND S.ABSTRACT_SALE = FALSE 
+        AND S.TYPE = 0  
+        AND CH.OPENED_BY <> ALL(%s) 
+    GROUP BY CH.STORE_ID, CH.OPENED_BY, DATE(S.CREATED_AT) 
+) AS a 
+ORDER BY a.data_venda DESC, a.store_id, a.opened_by;
+"""
+
+# Mesmo relatório lido da tabela de agregados diários (migrations/003_report_rollups.sql)
+ROLLUP_SALES_ITEMS_REPORT_QUERY = f"""
+SELECT 
+    r.store_id, 
+    r.opened_by, 
+    r.sale_date AS date, 
+    r.vendas_totais, 
+    r.itens_n_buffet, 
+    round( (r.itens_n_buffet::numeric / r.vendas_totais) * 100 , 2 ) AS perc_venda_itens, 
+    SUM(r.vendas_totais) OVER (PARTITION BY r.store_id, r.opened_by ORDER BY r.sale_date) AS vendas_totais_acumulado, 
+    SUM(r.itens_n_buffet) OVER (PARTITION BY r.store_id, r.opened_by ORDER BY r.sale_date) AS itens_n_buffet_acumulado,
+    round( (SUM(r.itens_n_buffet) OVER (PARTITION BY r.store_id, r.opened_by ORDER BY r.sale_date)::numeric / 
+    SUM(r.vendas_totais) OVER (PARTITION BY r.store_id, r.opened_by ORDER BY r.sale_date)) * 100 , 2 ) AS perc_venda_itens_acumulado 
+FROM REPORT_ROLLUP_SELLER_DAY r 
+WHERE r.store_id = ANY(%s) 
+    AND {date_range_predicate("r.sale_date")}
+    AND r.opened_by <> ALL(%s) 
+ORDER BY r.sale_date DESC, r.store_id, r.opened_by;
+"""
+
+# Tipos das colunas do resultado (a coluna 'date' é lida como data)
+SALES_ITEMS_REPORT_DTYPES = {
+    'store_id': 'int64',
+    'opened_by': 'int64',
+    'vendas_totais': 'int64',
+    'itens_n_buffet': 'float64',
+    'perc_venda_itens': 'float64',
+    'vendas_totais_acumulado': 'float64',
+    'itens_n_buffet_acumulado': 'float64',
+    'perc_venda_itens_acumulado': 'float64',
+}
+
+# Mapeamento de colunas para nomes mais amigáveis para o Streamlit
+COLUMN_RENAME_MAP = {
+    'store_id': 'Loja',
+    'name': 'Atendente',
+    'date': 'Data',
+    'vendas_totais': 'Vendas Totais',
+    'itens_n_buffet': 'Itens Não-Buffet',
+    'perc_venda_itens': '% Venda Itens',
+    'vendas_totais_acumulado': 'Vendas Totais Acumulado',
+    'itens_n_buffet_acumulado': 'Itens Não-Buffet Acumulado',
+    'perc_venda_itens_acumulado': '% Venda Itens Acumulado'
+}
+
+def read_sales_items_report_by_user(start_date, end_date, store_ids=None, excluded_sellers=None):
     """
     Lê os dados de vendas por atendente do banco de dados e retorna um DataFrame.
-    Inclui métricas diárias e acumuladas.
+    Inclui métricas diárias e acumuladas, por loja, para todas as lojas em uma única consulta.
     """
-    query = """
-    SELECT 
-        u.name, 
-        a.data_venda AS date, 
-        a.vendas_totais, 
-        a.itens_n_buffet, 
-        round( (a.itens_n_buffet::numeric / a.vendas_totais) * 100 , 2 ) AS perc_venda_itens, 
-        SUM(a.vendas_totais) OVER (PARTITION BY u.id ORDER BY a.data_venda) AS vendas_totais_acumulado, 
-        SUM(a.itens_n_buffet) OVER (PARTITION BY u.id ORDER BY a.data_venda) AS itens_n_buffet_acumulado,
-        round( (SUM(a.itens_n_buffet) OVER (PARTITION BY u.id ORDER BY a.data_venda)::numeric / 
-        SUM(a.vendas_totais) OVER (PARTITION BY u.id ORDER BY a.data_venda)) * 100 , 2 ) AS perc_venda_itens_acumulado 
-    FROM USER_THE_BEST u 
-    INNER JOIN ( 
-        SELECT  
-            DATE(S.CREATED_AT) AS data_venda, 
-            COUNT(1) AS vendas_totais, 
-            CH.OPENED_BY,  
-            MAX(U.NAME) AS nome_usuario, 
-            SUM(COALESCE(si.itens_n_buffet, 0)) AS itens_n_buffet
-        FROM CASH_HISTORY CH   
-        LEFT JOIN USER_THE_BEST U ON U.ID = CH.OPENED_BY  
-        INNER JOIN SALES S ON S.CASH_HISTORY_ID = CH.ID  
-        LEFT JOIN ( 
-            SELECT  
-                COUNT(1) AS itens_n_buffet,  
-                DATE(SI.CREATED_AT) AS CREATED_AT,  
-                si.sale_id AS sale_id  
-            FROM sale_items si  
-            WHERE si.name <> 'self-service' 
-            GROUP BY si.sale_id, DATE(SI.CREATED_AT) 
-        ) AS si ON si.sale_id = s.id  
-        WHERE 1=1 
-            AND CH.STORE_ID = 467 
-            AND DATE(S.CREATED_AT) >= %s
-            AND DATE(S.CREATED_AT) <= %s
-            AND S.ABSTRACT_SALE = FALSE 
-            AND S.TYPE = 0  
-        GROUP BY CH.OPENED_BY, DATE(S.CREATED_AT) 
-    ) AS A ON a.OPENED_BY = u.id 
-    WHERE 1=1 
-        AND u.name NOT IN ('juliano') 
-    ORDER BY a.data_venda DESC, u.id;
+    store_ids, excluded_sellers = report_filters(store_ids, excluded_sellers)
+    excluded_ids = excluded_seller_ids(excluded_sellers)
+    with get_report_connection() as conn:
+        df = fetch_frame(
+            conn,
+            ROLLUP_SALES_ITEMS_REPORT_QUERY if USE_ROLLUPS else SALES_ITEMS_REPORT_QUERY,
+            (store_ids, *sale_date_params(start_date, end_date), excluded_ids),
+            SALES_ITEMS_REPORT_DTYPES,
+            date_columns=('date',),
+        )
+
+    with timed('pandas', 'read_sales_items_report_by_user') as timing:
+        timing.rows = len(df)
+        return finalize_sales_items_report(attach_seller_names(df, 'name'))
+
+
+def finalize_sales_items_report(df):
+    """
+    Renomeia o resultado diário por atendente e calcula o ranking pela última data de cada um.
+
+    Args:
+        df (pd.DataFrame): Colunas de SALES_ITEMS_REPORT_QUERY, com 'date' em datetime64 e o rótulo
+            do atendente ('name') no lugar de 'opened_by'.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Dados diários renomeados e o % acumulado final por atendente.
     """
-    
-    # Mapeamento de colunas para nomes mais amigáveis para o Streamlit
-    column_rename_map = {
-        'name': 'Atendente',
-        'date': 'Data',
-        'vendas_totais': 'Vendas Totais',
-        'itens_n_buffet': 'Itens Não-Buffet',
-        'perc_venda_itens': '% Venda Itens',
-        'vendas_totais_acumulado': 'Vendas Totais Acumulado',
-        'itens_n_buffet_acumulado': 'Itens Não-Buffet Acumulado',
-        'perc_venda_itens_acumulado': '% Venda Itens Acumulado'
-    }
-    
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            cursor.execute(query, (start_date, end_date))
-            data = cursor.fetchall()
-            
-            if not data:
-                return pd.DataFrame(columns=list(column_rename_map.values()))
-            
-            df = pd.DataFrame(data)
-            df.columns = list(column_rename_map.keys())
+    if df.empty:
+        empty = pd.DataFrame(columns=list(COLUMN_RENAME_MAP.values()))
+        return empty, empty[["Loja", "Atendente", "% Venda Itens Acumulado"]]
 
-            # Converte as colunas de data e renomeia
-            df['date'] = pd.to_datetime(df['date'])
-            df.rename(columns=column_rename_map, inplace=True)
+    # Renomeia as colunas
+    df = df.rename(columns=COLUMN_RENAME_MAP)
 
-            if not df.empty:
-    # Pegar apenas a última data de cada atendente
-                df_total = (
-                df.sort_values("Data")  # garante ordem cronológica
-                .groupby("Atendente", as_index=False)
-                .last()[["Atendente", "% Venda Itens Acumulado"]]
-                )
+    # Pegar apenas a última data de cada atendente, em cada loja
+    df_total = (
+        df.sort_values("Data")  # garante ordem cronológica
+        .groupby(["Loja", "Atendente"], as_index=False, observed=True)
+        .last()[["Loja", "Atendente", "% Venda Itens Acumulado"]]
+    )
 
-                #print(ultima_data_por_atendente)
-            
-            return df , df_total
+    return df , df_total
 #start_date = datetime.date(2025, 8, 1) # Primeiro dia de agosto de 2025
 #end_date = datetime.date(2025, 8, 12)   # Nono dia de agosto de 2025
 #data , df_total = read_sales_items_report_by_user(end_date=end_date , start_date=start_date )      
@@ -0,0 +1,188 @@
+import os
+import sys
+import time
+import datetime
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import pandas as pd
+from report_queries import report_filters
+from get_connection import QueryCancelled
+
+# Orçamento de memória do cache, em MB
+REPORT_CACHE_MAX_MB = float(os.environ.get("CLUB_REPORT_CACHE_MAX_MB", "256"))
+
+# Validade, em segundos, de resultados cujo período inclui hoje (ainda em aberto)
+REPORT_CACHE_TODAY_TTL = float(os.environ.get("CLUB_REPORT_CACHE_TODAY_TTL", "60"))
+
+# Validade, em segundos, de resultados cujo período termina ontem. Ontem ainda não é tratado como
+# encerrado: a leitura pode ter vindo de uma réplica atrasada, e a virada do dia no banco pode não
+# coincidir com a do servidor do app
+REPORT_CACHE_RECENT_TTL = float(os.environ.get("CLUB_REPORT_CACHE_RECENT_TTL", "600"))
+
+
+def first_open_day(today=None):
+    """
+    Primeiro dia que ainda não é tratado como encerrado no cache (ontem, ver REPORT_CACHE_RECENT_TTL).
+    Resultados de períodos que terminam antes dele não expiram.
+    """
+    return (today or datetime.date.today()) - datetime.timedelta(days=1)
+
+
+def _nbytes(value):
+    """
+    Estima a memória ocupada por um resultado de relatório (DataFrame ou tupla de DataFrames).
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ReportCache:
+    """
+    Cache de resultados de relatório compartilhado por todas as sessões do processo.
+
+    - Pedidos idênticos em andamento são unificados: só o primeiro vai ao banco,
+      os demais esperam pelo mesmo resultado.
+    - As entradas são descartadas por LRU quando o total passa de `max_bytes`.
+    - Períodos que incluem hoje expiram após `today_ttl` segundos, os que terminam
+      ontem após `recent_ttl`; períodos que terminam antes disso não expiram.
+
+    Os resultados são compartilhados: quem os recebe não deve alterá-los.
+    """
+
+    def __init__(self, max_bytes, today_ttl, recent_ttl):
+        self.max_bytes = max_bytes
+        self.today_ttl = today_ttl
+        self.recent_ttl = recent_ttl
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, nbytes, _) = self._entries.popitem(last=False)
+            self._bytes -= nbytes
+            self._stats['evictions'] += 1
+
+    def _remove(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def _store(self, key, value, end_date):
+        nbytes = _nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        today = datetime.date.today()
+        if end_date >= today:
+            expires_at = time.monotonic() + self.today_ttl
+        elif end_date >= first_open_day(today):
+            expires_at = time.monotonic() + self.recent_ttl
+        else:
+            expires_at = None
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, nbytes, expires_at)
+        self._bytes += nbytes
+        self._evict()
+
+    def get_or_load(self, key, end_date, loader):
+        """
+        Retorna o resultado em cache para `key` ou o carrega com `loader()`.
+
+        Args:
+            key (tuple): Chave do resultado (relatório, lojas, início, fim, ...).
+            end_date (datetime.date): Fim do período, usado para decidir a validade.
+            loader (callable): Função sem argumentos que busca o resultado.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, _, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value
+                self._remove(key)
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self._stats['misses'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not owner:
+            try:
+                return future.result()
+            except QueryCancelled:
+                # Quem buscava foi cancelado (rerun substituído), mas este pedido continua valendo
+                return self.get_or_load(key, end_date, loader)
+
+        try:
+            value = loader()
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(exc)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._store(key, value, end_date)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: Acertos, faltas, pedidos unificados, descartes, entradas e bytes em uso.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['max_bytes'] = self.max_bytes
+        return stats
+
+
+_report_cache = ReportCache(int(REPORT_CACHE_MAX_MB * 1024 * 1024), REPORT_CACHE_TODAY_TTL, REPORT_CACHE_RECENT_TTL)
+
+
+def get_report_cache():
+    return _report_cache
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def cached_report(name, reader):
+    """
+    Envolve um leitor `reader(start_date, end_date, store_ids=None, **kwargs)` com o
+    cache do processo, usando (name, lojas, início, fim, kwargs) como chave.
+    """
+    @functools.wraps(reader)
+    def wrapper(start_date, end_date, store_ids=None, **kwargs):
+        store_ids, _ = report_filters(store_ids)
+        key = (name, tuple(store_ids), start_date, end_date, tuple(sorted((k, _freeze(v)) for k, v in kwargs.items())))
+        return _report_cache.get_or_load(
+            key,
+            end_date,
+            lambda: reader(start_date, end_date, store_ids, **kwargs),
+        )
+    return wrapper
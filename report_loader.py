@@ -0,0 +1,177 @@
+import datetime
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor, wait
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from get_club_data import get_club_data
+from read_sales_items_report_by_user import read_sales_items_report_by_user
+from read_sale_items_not_buffet import read_sale_items_not_buffet
+from sale_facts import combine_facts, read_sale_facts, read_sale_facts_estimate
+from report_queries import PROGRESSIVE_MIN_DAYS, USE_ROLLUPS
+from report_cache import cached_report, first_open_day
+from instrumentation import report_span
+from get_connection import CancelScope, cancel_scope
+
+_sale_facts = cached_report('sale_facts', read_sale_facts)
+
+
+def read_sale_facts_split(start_date, end_date, store_ids=None):
+    """
+    Fatos por venda (read_sale_facts) em duas entradas do cache: os dias encerrados, que não
+    expiram, e os dias ainda em aberto (ontem e hoje). Quando a validade curta expira, só o
+    trecho em aberto volta ao banco, e não o período inteiro.
+    """
+    first_open = first_open_day()
+    if start_date >= first_open or end_date < first_open:
+        return _sale_facts(start_date, end_date, store_ids)
+    return combine_facts(
+        _sale_facts(start_date, first_open - datetime.timedelta(days=1), store_ids),
+        _sale_facts(first_open, end_date, store_ids),
+    )
+
+
+# Consultas disponíveis para carregamento, pelo nome usado nas telas, atrás do
+# cache do processo (pedidos idênticos de sessões diferentes vão uma vez ao banco)
+REPORTS = {
+    'club_data': cached_report('club_data', get_club_data),
+    'sales_items_by_user': cached_report('sales_items_by_user', read_sales_items_report_by_user),
+    'sale_items_not_buffet': cached_report('sale_items_not_buffet', read_sale_items_not_buffet),
+    'sale_facts': read_sale_facts_split,
+    'sale_facts_estimate': cached_report('sale_facts_estimate', read_sale_facts_estimate),
+}
+
+# Espera, em segundos, pelas consultas exatas antes de recorrer à estimativa
+PROGRESSIVE_WAIT_S = 0.5
+
+# Consultas necessárias para cada tela do app. A tela de atendentes deriva o relatório
+# por atendente e o gráfico de itens dos fatos por venda (uma leitura em vez de duas),
+# exceto quando os agregados diários estão habilitados, que são mais baratos de ler;
+# a de CPF Club usa o armazenamento diário local, que só busca o delta no Postgres.
+VIEW_REPORTS = {
+    'CPF Club': ['club_data'],
+    'Vendas por Atendente': (
+        ['sales_items_by_user', 'sale_items_not_buffet'] if USE_ROLLUPS else ['sale_facts']
+    ),
+}
+
+
+# Pedidos em andamento de cada sessão: (relatório, início, fim, lojas) -> (escopo, future)
+_session_requests = {}
+_requests_lock = threading.Lock()
+
+
+@st.cache_resource
+def get_executor():
+    # Cada worker segura no máximo uma conexão do pool durante a consulta
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="report")
+
+
+def _run_with_ctx(ctx, scope, name, fn, *args):
+    """
+    Executa `fn` em um worker com o contexto da sessão que o pediu, para que os
+    caches do Streamlit e as medições do rerun funcionem fora da thread principal,
+    com as conexões associadas ao escopo de cancelamento do pedido.
+    """
+    thread = threading.current_thread()
+    add_script_run_ctx(thread, ctx)
+    try:
+        with cancel_scope(scope), report_span(name):
+            return fn(*args)
+    finally:
+        add_script_run_ctx(thread, None)
+
+
+def _forget_request(session, key, future):
+    """
+    Remove o pedido concluído do registro da sessão (o resultado continua no cache de relatórios).
+    """
+    with _requests_lock:
+        requests = _session_requests.get(session)
+        if requests is not None and requests.get(key, (None, None))[1] is future:
+            del requests[key]
+            if not requests:
+                del _session_requests[session]
+
+
+def load_reports(names, start_date, end_date, store_ids=None):
+    """
+    Dispara em paralelo as consultas informadas e retorna os futures sem esperar por eles.
+
+    Os pedidos anteriores da mesma sessão que não fazem parte deste são cancelados
+    (inclusive as consultas já em execução no servidor): depois de uma troca de datas,
+    ninguém mais verá aqueles resultados. Pedidos iguais ainda em andamento são reaproveitados.
+
+    Args:
+        names (list[str]): Nomes das consultas em REPORTS.
+        start_date (datetime.date): Data inicial do período.
+        end_date (datetime.date): Data final do período.
+        store_ids (list[int]): Lojas a consultar, todas na mesma consulta (padrão: DEFAULT_STORE_IDS).
+
+    Returns:
+        dict[str, concurrent.futures.Future]: Future de cada consulta, pelo nome.
+    """
+    executor = get_executor()
+    ctx = get_script_run_ctx()
+    session = ctx.session_id if ctx is not None else None
+    keys = {name: (name, start_date, end_date, tuple(store_ids or ())) for name in names}
+
+    with _requests_lock:
+        previous = _session_requests.pop(session, {})
+    requests = {}
+    for key, (scope, future) in previous.items():
+        if key in keys.values() and not future.done():
+            requests[key] = (scope, future)
+        elif not future.done():
+            future.cancel()
+            scope.cancel()
+
+    for name, key in keys.items():
+        if key not in requests:
+            scope = CancelScope()
+            requests[key] = (scope, executor.submit(
+                _run_with_ctx, ctx, scope, name, REPORTS[name], start_date, end_date, store_ids
+            ))
+    with _requests_lock:
+        _session_requests[session] = dict(requests)
+    for key, (_, future) in requests.items():
+        future.add_done_callback(functools.partial(_forget_request, session, key))
+    return {name: requests[key][1] for name, key in keys.items()}
+
+
+def load_view(view, start_date, end_date, store_ids=None):
+    """
+    Dispara apenas as consultas da tela visível.
+
+    Returns:
+        dict[str, concurrent.futures.Future]: Future de cada consulta da tela, pelo nome.
+    """
+    return load_reports(VIEW_REPORTS[view], start_date, end_date, store_ids)
+
+
+def load_estimate(view, reports, start_date, end_date, store_ids=None):
+    """
+    Estimativa por amostragem (read_sale_facts_estimate) para a tela, quando o período é
+    longo e as consultas exatas ainda não terminaram depois de PROGRESSIVE_WAIT_S. As
+    consultas exatas continuam rodando; a estimativa só é devolvida se chegar antes delas.
+
+    Com os agregados diários habilitados as consultas exatas já são baratas e não há estimativa.
+
+    Args:
+        view (str): Tela visível.
+        reports (dict[str, concurrent.futures.Future]): Futures devolvidos por load_view.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame] | None: Fatos estimados, ou None se não valer a pena.
+    """
+    if USE_ROLLUPS or PROGRESSIVE_MIN_DAYS <= 0 or (end_date - start_date).days + 1 < PROGRESSIVE_MIN_DAYS:
+        return None
+    _, pending = wait(list(reports.values()), timeout=PROGRESSIVE_WAIT_S)
+    if not pending:
+        return None
+    # Pedido junto com os da tela, para que eles sejam reaproveitados e não cancelados
+    names = [*VIEW_REPORTS[view], 'sale_facts_estimate']
+    estimate = load_reports(names, start_date, end_date, store_ids)['sale_facts_estimate'].result()
+    if all(future.done() for future in reports.values()):
+        return None
+    return estimate
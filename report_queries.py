@@ -0,0 +1,73 @@
+import os
+import datetime
+
+# Usa a coluna armazenada SALES.SALE_DATE (migrations/002_sales_sale_date.sql) em vez de CREATED_AT
+USE_SALE_DATE_COLUMN = os.environ.get("CLUB_USE_SALE_DATE_COLUMN", "0") == "1"
+
+# Lê os relatórios das tabelas de agregados diários (migrations/003_report_rollups.sql)
+USE_ROLLUPS = os.environ.get("CLUB_USE_ROLLUPS", "0") == "1"
+
+# Lojas consultadas por padrão (ex.: CLUB_STORE_IDS="467,512")
+DEFAULT_STORE_IDS = tuple(int(store) for store in os.environ.get("CLUB_STORE_IDS", "467").split(","))
+
+# Vendedores fora dos rankings por padrão (ex.: CLUB_EXCLUDED_SELLERS="juliano,admin")
+DEFAULT_EXCLUDED_SELLERS = tuple(os.environ.get("CLUB_EXCLUDED_SELLERS", "juliano").split(","))
+
+# Itens mostrados no gráfico de itens: os TOP_ITEMS mais vendidos no geral e os TOP_ITEMS_PER_SELLER
+# mais vendidos de cada atendente; o restante é somado em OTHER_ITEMS_LABEL (0 desliga cada limite)
+TOP_ITEMS = int(os.environ.get("CLUB_TOP_ITEMS", "15"))
+TOP_ITEMS_PER_SELLER = int(os.environ.get("CLUB_TOP_ITEMS_PER_SELLER", "0"))
+OTHER_ITEMS_LABEL = "Outros"
+
+# Períodos com pelo menos PROGRESSIVE_MIN_DAYS dias mostram primeiro uma estimativa por amostragem
+# (PROGRESSIVE_SAMPLE_PCT % das páginas de SALES), trocada pelo resultado exato quando ele chega (0 desliga)
+PROGRESSIVE_MIN_DAYS = int(os.environ.get("CLUB_PROGRESSIVE_MIN_DAYS", "60"))
+PROGRESSIVE_SAMPLE_PCT = float(os.environ.get("CLUB_PROGRESSIVE_SAMPLE_PCT", "2"))
+
+
+def report_filters(store_ids=None, excluded_sellers=None):
+    """
+    Normaliza os filtros de loja e de vendedores excluídos, aplicando os padrões.
+
+    Returns:
+        tuple[list[int], list[str]]: Listas prontas para `= ANY(%s)` / `<> ALL(%s)`.
+    """
+    store_ids = DEFAULT_STORE_IDS if store_ids is None else store_ids
+    excluded_sellers = DEFAULT_EXCLUDED_SELLERS if excluded_sellers is None else excluded_sellers
+    return [int(store) for store in store_ids], list(excluded_sellers)
+
+
+def date_range_predicate(column):
+    """
+    Retorna o predicado semiaberto `column >= %s AND column < %s` para a coluna informada.
+    """
+    return f"{column} >= %s AND {column} < %s"
+
+
+def sale_date_predicate(alias="S"):
+    """
+    Retorna o predicado de período sobre as vendas, no formato semiaberto [início, fim + 1 dia).
+
+    A coluna é comparada diretamente (sem DATE(...)), para que o Postgres possa usar
+    o índice em CREATED_AT (ou em SALE_DATE, quando habilitado). Os parâmetros
+    correspondentes são gerados por `sale_date_params`.
+
+    Args:
+        alias (str): Alias da tabela SALES na consulta.
+
+    Returns:
+        str: Fragmento SQL com dois placeholders `%s`.
+    """
+    column = f"{alias}.SALE_DATE" if USE_SALE_DATE_COLUMN else f"{alias}.CREATED_AT"
+    return date_range_predicate(column)
+
+
+def sale_date_params(start_date, end_date):
+    """
+    Converte um período fechado de datas [start_date, end_date] nos parâmetros
+    do predicado semiaberto de `sale_date_predicate`.
+
+    Returns:
+        tuple: (start_date, end_date + 1 dia).
+    """
+    return (start_date, end_date + datetime.timedelta(days=1))
@@ -0,0 +1,63 @@
+from prefix_index import prefix_index_for
+
+# Consolidação mostrada ao abrir a tela de CPF Club
+DEFAULT_GRANULARITY = "Semana"
+
+
+def club_index(df):
+    """
+    Somas prefixadas por loja e vendedor dos dados de CPF Club (get_club_data), usadas
+    no ranking e na comparação de períodos sem nova consulta.
+    """
+    return prefix_index_for(
+        df, 'Data da Venda', ['Loja', 'Vendedor'], ['Qtd. CPF Clube (Dia)', 'Vendas Totais (Dia)']
+    )
+
+
+def club_ranking(graph, index, start_date, end_date):
+    """
+    Ranking de CPF Club por vendedor no recorte [start_date, end_date], memorizado no grafo de artefatos.
+
+    Args:
+        graph (ArtifactGraph): Grafo de artefatos do processo.
+        index (PrefixSumIndex): Índice retornado por club_index.
+        start_date (datetime.date): Início do recorte.
+        end_date (datetime.date): Fim do recorte.
+
+    Returns:
+        pd.DataFrame: Uma linha por vendedor, com '% CPF Clube (Acumulado)'.
+    """
+    return graph.derive(
+        index.ratio,
+        start_date, end_date, 'Qtd. CPF Clube (Dia)', 'Vendas Totais (Dia)', '% CPF Clube (Acumulado)',
+        by=['Vendedor']
+    )
+
+
+def items_index(data):
+    """
+    Somas prefixadas por loja e atendente do relatório de vendas por atendente.
+    """
+    return prefix_index_for(
+        data, 'Data', ['Loja', 'Atendente'], ['Itens Não-Buffet', 'Vendas Totais']
+    )
+
+
+def items_ranking(graph, index, start_date, end_date):
+    """
+    Ranking de venda de itens por atendente no recorte [start_date, end_date], memorizado no grafo de artefatos.
+
+    Args:
+        graph (ArtifactGraph): Grafo de artefatos do processo.
+        index (PrefixSumIndex): Índice retornado por items_index.
+        start_date (datetime.date): Início do recorte.
+        end_date (datetime.date): Fim do recorte.
+
+    Returns:
+        pd.DataFrame: Uma linha por atendente, com '% Venda Itens Acumulado'.
+    """
+    return graph.derive(
+        index.ratio,
+        start_date, end_date, 'Itens Não-Buffet', 'Vendas Totais', '% Venda Itens Acumulado',
+        by=['Atendente']
+    )
@@ -0,0 +1,193 @@
+import os
+import argparse
+import datetime
+import pandas as pd
+from get_connection import get_connection
+
+# Nome do registro em REPORT_ROLLUP_WATERMARK usado pelo refresh incremental
+WATERMARK_NAME = "report_rollups"
+
+# Coluna de SALES que marca criação/alteração de uma venda. Use UPDATED_AT (ou similar)
+# se a tabela tiver uma, para que alterações em vendas antigas também sejam reprocessadas.
+CHANGE_COLUMN = os.environ.get("CLUB_ROLLUP_CHANGE_COLUMN", "CREATED_AT")
+
+# Janela antes da marca d'água recalculada a cada refresh: vendas confirmadas depois do refresh
+# anterior com CREATED_AT mais antigo (upload atrasado do PDV, transação longa) ainda entram
+ROLLUP_OVERLAP = datetime.timedelta(days=int(os.environ.get("CLUB_ROLLUP_OVERLAP_DAYS", "2")))
+
+# Tamanho de cada lote do backfill, em dias (um lote por transação)
+BACKFILL_CHUNK_DAYS = 31
+
+# A manutenção dos agregados não fica sujeita ao statement_timeout dos relatórios
+_NO_STATEMENT_TIMEOUT = "SET LOCAL statement_timeout = 0"
+
+# Dias a recalcular: (store_id, sale_date) na tabela temporária rollup_dias
+_AFFECTED_DAYS = """
+    CREATE TEMP TABLE rollup_dias ON COMMIT DROP AS
+    SELECT DISTINCT CH.STORE_ID AS store_id, DATE(S.CREATED_AT) AS sale_date
+    FROM SALES S
+    INNER JOIN CASH_HISTORY CH ON CH.ID = S.CASH_HISTORY_ID
+    WHERE {where}
+"""
+
+_DELETE_ROLLUPS = """
+    DELETE FROM REPORT_ROLLUP_SELLER_DAY R USING rollup_dias D
+    WHERE R.STORE_ID = D.store_id AND R.SALE_DATE = D.sale_date;
+    DELETE FROM REPORT_ROLLUP_SELLER_ITEM_DAY R USING rollup_dias D
+    WHERE R.STORE_ID = D.store_id AND R.SALE_DATE = D.sale_date;
+"""
+
+# Restringe as vendas aos dias afetados, mantendo um intervalo de CREATED_AT para usar o índice
+_AFFECTED_SALES = """
+    S.CREATED_AT >= (SELECT MIN(sale_date) FROM rollup_dias)
+    AND S.CREATED_AT < (SELECT MAX(sale_date) FROM rollup_dias) + 1
+    AND (CH.STORE_ID, DATE(S.CREATED_AT)) IN (SELECT store_id, sale_date FROM rollup_dias)
+    AND S.ABSTRACT_SALE = FALSE
+    AND S.TYPE = 0
+"""
+
+_INSERT_SELLER_DAY = f"""
+    INSERT INTO REPORT_ROLLUP_SELLER_DAY (store_id, sale_date, opened_by, vendas_totais, qty_cpf_club, itens_n_buffet)
+    SELECT
+        CH.STORE_ID,
+        DATE(S.CREATED_AT),
+        CH.OPENED_BY,
+        COUNT(1),
+        SUM(CASE WHEN COALESCE(S.client_cpf, '') <> '' THEN 1 ELSE 0 END),
+        SUM(SI.itens_n_buffet)
+    FROM CASH_HISTORY CH
+    INNER JOIN SALES S ON S.CASH_HISTORY_ID = CH.ID
+    LEFT JOIN LATERAL (
+        SELECT COUNT(1) AS itens_n_buffet
+        FROM SALE_ITEMS si
+        WHERE si.sale_id = S.ID
+            AND si.name <> 'self-service'
+    ) AS SI ON TRUE
+    WHERE {_AFFECTED_SALES}
+    GROUP BY CH.STORE_ID, DATE(S.CREATED_AT), CH.OPENED_BY
+"""
+
+_INSERT_SELLER_ITEM_DAY = f"""
+    INSERT INTO REPORT_ROLLUP_SELLER_ITEM_DAY (store_id, sale_date, opened_by, item, vendas_totais)
+    SELECT
+        CH.STORE_ID,
+        DATE(S.CREATED_AT),
+        CH.OPENED_BY,
+        SI.NAME,
+        COUNT(1)
+    FROM CASH_HISTORY CH
+    INNER JOIN SALES S ON S.CASH_HISTORY_ID = CH.ID
+    INNER JOIN SALE_ITEMS SI ON SI.SALE_ID = S.ID
+    WHERE {_AFFECTED_SALES}
+        AND SI.NAME <> 'self-service'
+    GROUP BY CH.STORE_ID, DATE(S.CREATED_AT), CH.OPENED_BY, SI.NAME
+"""
+
+
+def _rebuild_affected_days(cursor):
+    """
+    Recalcula as duas tabelas de agregados para os dias listados em rollup_dias.
+
+    Returns:
+        int: Quantidade de (loja, dia) recalculados.
+    """
+    cursor.execute("SELECT COUNT(1) AS dias FROM rollup_dias")
+    days = cursor.fetchone()['dias']
+    if days:
+        cursor.execute(_DELETE_ROLLUPS)
+        cursor.execute(_INSERT_SELLER_DAY)
+        cursor.execute(_INSERT_SELLER_ITEM_DAY)
+    return days
+
+
+def refresh_rollups():
+    """
+    Processa apenas as vendas criadas ou alteradas desde a última marca d'água (menos a
+    janela ROLLUP_OVERLAP), recalculando os dias (por loja) em que elas caem.
+
+    Returns:
+        int: Quantidade de (loja, dia) recalculados.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(_NO_STATEMENT_TIMEOUT)
+            cursor.execute(
+                "SELECT watermark FROM REPORT_ROLLUP_WATERMARK WHERE name = %s FOR UPDATE",
+                (WATERMARK_NAME,),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                raise RuntimeError("Agregados sem marca d'água: rode `python rollups.py backfill` primeiro.")
+
+            cursor.execute(f"SELECT MAX(S.{CHANGE_COLUMN}) AS watermark FROM SALES S")
+            new_watermark = cursor.fetchone()['watermark']
+            if new_watermark is None:
+                return 0
+            # Mesmo sem vendas acima da marca d'água, a janela de sobreposição é recalculada:
+            # uma venda atrasada não move o MAX
+            new_watermark = max(new_watermark, row['watermark'])
+
+            cursor.execute(
+                _AFFECTED_DAYS.format(where=f"S.{CHANGE_COLUMN} > %s AND S.{CHANGE_COLUMN} <= %s"),
+                (row['watermark'] - ROLLUP_OVERLAP, new_watermark),
+            )
+            days = _rebuild_affected_days(cursor)
+            cursor.execute(
+                "UPDATE REPORT_ROLLUP_WATERMARK SET watermark = %s WHERE name = %s",
+                (new_watermark, WATERMARK_NAME),
+            )
+            return days
+
+
+def backfill_rollups(start_date, end_date, chunk_days=BACKFILL_CHUNK_DAYS):
+    """
+    Preenche os agregados do histórico [start_date, end_date], em lotes de `chunk_days` dias.
+
+    Se ainda não houver marca d'água, ela é iniciada com o momento anterior ao backfill,
+    de modo que o primeiro refresh reprocesse o que chegou durante a carga.
+
+    Returns:
+        int: Quantidade de (loja, dia) recalculados.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO REPORT_ROLLUP_WATERMARK (name, watermark) VALUES (%s, LOCALTIMESTAMP) "
+                "ON CONFLICT (name) DO NOTHING",
+                (WATERMARK_NAME,),
+            )
+
+    total = 0
+    for chunk_start in pd.date_range(start_date, end_date, freq=f"{chunk_days}D").date:
+        chunk_end = min(chunk_start + datetime.timedelta(days=chunk_days), end_date + datetime.timedelta(days=1))
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(_NO_STATEMENT_TIMEOUT)
+                cursor.execute(
+                    _AFFECTED_DAYS.format(where="S.CREATED_AT >= %s AND S.CREATED_AT < %s"),
+                    (chunk_start, chunk_end),
+                )
+                days = _rebuild_affected_days(cursor)
+        total += days
+        print(f"{chunk_start} .. {chunk_end - datetime.timedelta(days=1)}: {days} dia(s) por loja")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantém as tabelas de agregados diários dos relatórios.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("refresh", help="Processa as vendas novas ou alteradas desde a última marca d'água.")
+    backfill = commands.add_parser("backfill", help="Recalcula o histórico de um período.")
+    backfill.add_argument("--start", required=True, type=datetime.date.fromisoformat, help="Data inicial (AAAA-MM-DD).")
+    backfill.add_argument("--end", type=datetime.date.fromisoformat, default=datetime.date.today(), help="Data final (AAAA-MM-DD).")
+    backfill.add_argument("--chunk-days", type=int, default=BACKFILL_CHUNK_DAYS, help="Dias por transação.")
+    args = parser.parse_args()
+
+    if args.command == "refresh":
+        print(f"{refresh_rollups()} dia(s) por loja recalculados")
+    else:
+        print(f"{backfill_rollups(args.start, args.end, args.chunk_days)} dia(s) por loja recalculados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import pandas as pd
+from get_connection import get_report_connection
+from fetch_frame import ChunkedGroupBy, fetch_frame, iter_frames
+from report_queries import PROGRESSIVE_SAMPLE_PCT, report_filters, sale_date_predicate, sale_date_params
+from get_club_data import accumulate_club_data
+from read_sales_items_report_by_user import finalize_sales_items_report
+from read_sale_items_not_buffet import fold_top_items
+from user_directory import attach_seller_names, excluded_seller_ids
+
+# Separador dos nomes de itens agregados por venda (caractere "unit separator")
+ITEM_SEPARATOR = "\x1f"
+
+# Um registro por venda do período: vendedor (só o id; o nome vem de user_directory), CPF
+# informado e itens não-buffet. É a única leitura de SALES/SALE_ITEMS necessária para montar as abas do app.
+# `{{filtro}}` recebe condições extras (ex.: a marca d'água do modo ao vivo).
+_SALE_FACTS_TEMPLATE = f"""
+    SELECT
+        S.ID AS sale_id,
+        CH.STORE_ID AS store_id,
+        DATE(S.CREATED_AT) AS data_venda,
+        CH.OPENED_BY AS opened_by,
+        CASE WHEN COALESCE(S.client_cpf, '') <> '' THEN 1 ELSE 0 END AS tem_cpf,
+        COUNT(SI.NAME) FILTER (WHERE SI.NAME <> 'self-service') AS itens_n_buffet,
+        STRING_AGG(SI.NAME, CHR(31)) FILTER (WHERE SI.NAME <> 'self-service') AS itens
+    FROM CASH_HISTORY CH
+    INNER JOIN SALES S ON S.CASH_HISTORY_ID = CH.ID
+    LEFT JOIN SALE_ITEMS SI ON SI.SALE_ID = S.ID
+    WHERE CH.STORE_ID = ANY(%s)
+        AND {sale_date_predicate()}
+        AND S.ABSTRACT_SALE = FALSE
+        AND S.TYPE = 0
+        {{filtro}}
+    GROUP BY S.ID, CH.STORE_ID, DATE(S.CREATED_AT), S.client_cpf, CH.OPENED_BY
+"""
+
+SALE_FACTS_QUERY = _SALE_FACTS_TEMPLATE.format(filtro="")
+
+# Apenas as vendas com ID acima da marca d'água (parâmetro extra, após o período)
+SALE_FACTS_SINCE_QUERY = _SALE_FACTS_TEMPLATE.format(filtro="AND S.ID > %s")
+
+# Estimativa rápida dos fatos diários: amostra das páginas de SALES (TABLESAMPLE SYSTEM, com
+# semente fixa para a estimativa não mudar entre reruns), consolidada por semana. Cada semana
+# aparece no último dia amostrado dela, para ficar dentro do período pedido.
+SALE_FACTS_ESTIMATE_QUERY = f"""
+    SELECT
+        CH.STORE_ID AS store_id,
+        CH.OPENED_BY AS opened_by,
+        MAX(DATE(S.CREATED_AT)) AS data_venda,
+        SUM(CASE WHEN COALESCE(S.client_cpf, '') <> '' THEN 1 ELSE 0 END) AS qty_cpf_club,
+        COUNT(1) AS vendas_totais,
+        SUM(SI.itens_n_buffet) AS itens_n_buffet
+    FROM SALES S TABLESAMPLE SYSTEM (%s) REPEATABLE (0)
+    INNER JOIN CASH_HISTORY CH ON CH.ID = S.CASH_HISTORY_ID
+    LEFT JOIN LATERAL (
+        SELECT COUNT(1) AS itens_n_buffet
+        FROM SALE_ITEMS SI
+        WHERE SI.SALE_ID = S.ID
+            AND SI.NAME <> 'self-service'
+    ) AS SI ON TRUE
+    WHERE CH.STORE_ID = ANY(%s)
+        AND {sale_date_predicate()}
+        AND S.ABSTRACT_SALE = FALSE
+        AND S.TYPE = 0
+    GROUP BY CH.STORE_ID, CH.OPENED_BY, DATE_TRUNC('week', S.CREATED_AT)
+"""
+
+SALE_FACTS_DTYPES = {
+    'sale_id': 'int64',
+    'store_id': 'int64',
+    'opened_by': 'int64',
+    'tem_cpf': 'int64',
+    'itens_n_buffet': 'int64',
+    'itens': 'object',
+}
+
+
+# Consolidação dos fatos por (loja, vendedor, dia): base dos relatórios de CPF Clube e por atendente
+DAILY_AGGS = {
+    'qty_cpf_club': ('tem_cpf', 'sum'),
+    'vendas_totais': ('sale_id', 'size'),
+    'itens_n_buffet': ('itens_n_buffet', 'sum'),
+}
+
+
+def _explode_items(chunk):
+    """
+    Uma linha por item não-buffet vendido.
+    """
+    items = chunk.loc[chunk['itens'].notna(), ['store_id', 'opened_by', 'itens']]
+    return items.assign(item=items['itens'].str.split(ITEM_SEPARATOR)).explode('item')
+
+
+class SaleFactsAccumulator:
+    """
+    Consolida blocos de fatos por venda (linhas de SALE_FACTS_QUERY) por (loja, vendedor, dia)
+    e por (loja, item, vendedor), sem guardar as vendas. Os vendedores ficam pelo id.
+    """
+
+    def __init__(self):
+        self.daily = ChunkedGroupBy(['store_id', 'opened_by', 'data_venda'], DAILY_AGGS)
+        self.items = ChunkedGroupBy(['store_id', 'item', 'opened_by'], {'vendas_totais': ('item', 'size')})
+
+    def add(self, chunk):
+        self.daily.add(chunk)
+        self.items.add(_explode_items(chunk))
+
+    def result(self):
+        """
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: Fatos diários e contagem de itens (ver read_sale_facts).
+        """
+        return self.daily.result(), self.items.result()
+
+
+def combine_facts(*facts):
+    """
+    Junta fatos consolidados de períodos disjuntos (ex.: histórico até ontem e o dia de hoje).
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Fatos diários e contagem de itens do período todo.
+    """
+    facts = [f for f in facts if f is not None]
+    daily = pd.concat([d for d, _ in facts if not d.empty] or [facts[0][0]], ignore_index=True)
+    items = pd.concat([i for _, i in facts if not i.empty] or [facts[0][1]], ignore_index=True)
+    if not items.empty:
+        items = items.groupby(['store_id', 'item', 'opened_by'], as_index=False)['vendas_totais'].sum()
+    return daily, items
+
+
+def read_sale_facts(start_date, end_date, store_ids=None):
+    """
+    Lê os fatos por venda do período, de todas as lojas, em uma única consulta, e os
+    consolida por (loja, vendedor, dia) e por (loja, item, vendedor).
+
+    A consolidação é feita bloco a bloco (iter_frames + ChunkedGroupBy): com
+    CLUB_STREAM_ITERSIZE definido, as vendas são lidas por um cursor do lado do
+    servidor e a memória fica limitada ao tamanho de um bloco mais os agregados,
+    mesmo em períodos de vários anos.
+
+    Args:
+        start_date (datetime.date): Data inicial do período.
+        end_date (datetime.date): Data final do período.
+        store_ids (list[int]): Lojas a consultar (padrão: DEFAULT_STORE_IDS).
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Fatos diários ['store_id', 'opened_by', 'data_venda',
+        'qty_cpf_club', 'vendas_totais', 'itens_n_buffet'] e contagem de itens
+        ['store_id', 'item', 'opened_by', 'vendas_totais'].
+    """
+    store_ids, _ = report_filters(store_ids)
+    facts = SaleFactsAccumulator()
+    with get_report_connection() as conn:
+        for chunk in iter_frames(
+            conn,
+            SALE_FACTS_QUERY,
+            (store_ids, *sale_date_params(start_date, end_date)),
+            SALE_FACTS_DTYPES,
+            date_columns=('data_venda',),
+        ):
+            facts.add(chunk)
+    return facts.result()
+
+
+def read_sale_facts_estimate(start_date, end_date, store_ids=None, sample_pct=None):
+    """
+    Estimativa dos fatos consolidados (read_sale_facts) a partir de uma amostra das vendas,
+    por semana, com as contagens reescaladas para o total. Serve para mostrar algo
+    aproximado enquanto a consulta exata de um período longo ainda está rodando.
+
+    Args:
+        start_date (datetime.date): Data inicial do período.
+        end_date (datetime.date): Data final do período.
+        store_ids (list[int]): Lojas a consultar (padrão: DEFAULT_STORE_IDS).
+        sample_pct (float): Porcentagem das páginas de SALES lidas (padrão: PROGRESSIVE_SAMPLE_PCT).
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Fatos semanais no formato dos diários e contagem de itens vazia.
+    """
+    store_ids, _ = report_filters(store_ids)
+    sample_pct = PROGRESSIVE_SAMPLE_PCT if sample_pct is None else sample_pct
+    with get_report_connection() as conn:
+        daily = fetch_frame(
+            conn,
+            SALE_FACTS_ESTIMATE_QUERY,
+            (sample_pct, store_ids, *sale_date_params(start_date, end_date)),
+            {'store_id': 'int64', 'opened_by': 'int64', 'qty_cpf_club': 'float64',
+             'vendas_totais': 'float64', 'itens_n_buffet': 'float64'},
+            date_columns=('data_venda',),
+        )
+    scale = 100.0 / sample_pct
+    daily[['qty_cpf_club', 'vendas_totais', 'itens_n_buffet']] *= scale
+    items = pd.DataFrame(columns=['store_id', 'item', 'opened_by', 'vendas_totais'])
+    return daily, items
+
+
+def _ranked_sellers(daily, excluded_sellers=None):
+    """
+    Mantém apenas os vendedores cadastrados e fora da lista de exclusão, com o nome em 'nome_usuario'.
+    """
+    daily = daily[~daily['opened_by'].isin(excluded_seller_ids(excluded_sellers))]
+    return attach_seller_names(daily, 'nome_usuario', drop_ids=False)
+
+
+def club_data_from_facts(facts, excluded_sellers=None):
+    """
+    Deriva dos fatos consolidados (read_sale_facts) o mesmo DataFrame retornado por get_club_data.
+    """
+    daily, _ = facts
+    daily = _ranked_sellers(daily, excluded_sellers)[
+        ['store_id', 'opened_by', 'data_venda', 'nome_usuario', 'qty_cpf_club', 'vendas_totais']
+    ]
+    daily = daily.assign(data_venda=pd.to_datetime(daily['data_venda']).dt.date)
+    return accumulate_club_data(daily)
+
+
+def sales_items_report_from_facts(facts, excluded_sellers=None):
+    """
+    Deriva dos fatos consolidados (read_sale_facts) o mesmo par (df, df_total) retornado
+    por read_sales_items_report_by_user.
+    """
+    daily, _ = facts
+    daily = (
+        _ranked_sellers(daily, excluded_sellers)
+        .rename(columns={'nome_usuario': 'name'})
+        [['store_id', 'opened_by', 'data_venda', 'name', 'vendas_totais', 'itens_n_buffet']]
+        .sort_values(['store_id', 'opened_by', 'data_venda'])
+    )
+    if daily.empty:
+        return finalize_sales_items_report(pd.DataFrame())
+    daily['itens_n_buffet'] = daily['itens_n_buffet'].astype(float)
+    daily['perc_venda_itens'] = ((daily['itens_n_buffet'] / daily['vendas_totais']) * 100).round(2)
+    partition = daily.groupby(['store_id', 'opened_by'])
+    daily['vendas_totais_acumulado'] = partition['vendas_totais'].cumsum().astype(float)
+    daily['itens_n_buffet_acumulado'] = partition['itens_n_buffet'].cumsum()
+    daily['perc_venda_itens_acumulado'] = (
+        (daily['itens_n_buffet_acumulado'] / daily['vendas_totais_acumulado']) * 100
+    ).round(2)
+
+    df = (
+        daily.sort_values(['data_venda', 'store_id', 'opened_by'], ascending=[False, True, True])
+        .rename(columns={'data_venda': 'date'})
+        .reset_index(drop=True)
+    )
+    df = df[[
+        'store_id',
+        'name',
+        'date',
+        'vendas_totais',
+        'itens_n_buffet',
+        'perc_venda_itens',
+        'vendas_totais_acumulado',
+        'itens_n_buffet_acumulado',
+        'perc_venda_itens_acumulado',
+    ]]
+    return finalize_sales_items_report(df)
+
+
+def sale_items_not_buffet_from_facts(facts, top=None, top_per_seller=None):
+    """
+    Deriva dos fatos consolidados (read_sale_facts) o mesmo DataFrame retornado por
+    read_sale_items_not_buffet, com a mesma regra de itens mais vendidos (fold_top_items).
+    """
+    _, items = facts
+    df = attach_seller_names(items, 'atendente')
+    df['vendas_totais'] = df['vendas_totais'].astype('int64')
+    df["Vendas Totais"] = df["vendas_totais"]
+    return fold_top_items(df, top, top_per_seller)
@@ -0,0 +1,67 @@
+import os
+import sys
+import tomllib
+import functools
+
+# Arquivos lidos pelo st.secrets, na mesma ordem (o último tem prioridade)
+SECRETS_PATHS = (
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+    os.path.join(os.getcwd(), ".streamlit", "secrets.toml"),
+)
+
+_REQUIRED = object()
+
+
+def _streamlit_running():
+    """
+    Verdadeiro dentro de um servidor Streamlit em execução, e não só com o módulo importado
+    (ex.: `python warmup.py` importa o Streamlit, mas não roda o app).
+    """
+    if "streamlit" not in sys.modules:
+        return False
+    from streamlit import runtime
+    return runtime.exists()
+
+
+@functools.lru_cache(maxsize=None)
+def _secrets():
+    """
+    Carrega os segredos de conexão. Dentro do app usa o próprio st.secrets (que também
+    cobre os segredos do Streamlit Cloud); fora dele, lê os mesmos arquivos secrets.toml.
+    """
+    if _streamlit_running():
+        import streamlit as st
+        try:
+            return st.secrets.to_dict()
+        except FileNotFoundError:
+            return {}
+
+    secrets = {}
+    for path in SECRETS_PATHS:
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                secrets.update(tomllib.load(f))
+    return secrets
+
+
+def get_setting(name, default=_REQUIRED):
+    """
+    Lê uma configuração pela variável de ambiente CLUB_<NOME> ou, se ausente, pelo secrets.toml,
+    sem depender do Streamlit (usado também pelos scripts de linha de comando).
+
+    Args:
+        name (str): Nome da chave no secrets.toml (ex.: 'dbname', 'pool_maxconn').
+        default: Valor quando a chave não existe em nenhuma das fontes.
+
+    Raises:
+        KeyError: Se a chave não existir e nenhum padrão for informado.
+    """
+    value = os.environ.get(f"CLUB_{name.upper()}")
+    if value is not None:
+        return value
+    secrets = _secrets()
+    if name in secrets:
+        return secrets[name]
+    if default is _REQUIRED:
+        raise KeyError(f"Configuração ausente: defina CLUB_{name.upper()} ou '{name}' no secrets.toml")
+    return default
@@ -1,14 +1,32 @@
 import streamlit as st
-import pandas as pd
-from psycopg2.extras import RealDictCursor
-import altair as alt
 import datetime
+import os
+import time
 from create_club_chart import create_club_chart, create_ranking_chart
-from get_club_data import get_club_data , generate_total_weekly_df, generate_weekly_df
-from read_sales_items_report_by_user import read_sales_items_report_by_user
-from create_sales_chart_by_user import create_sales_chart_by_user
+from create_sales_chart_by_user import create_items_ranking_chart, create_sales_chart_by_user
 from create_sale_items_chart import create_sale_items_chart
-from read_sale_items_not_buffet import read_sale_items_not_buffet
+from report_loader import VIEW_REPORTS, load_estimate, load_reports, load_view
+from live_today import LIVE_REFRESH_S, get_live_day
+from sale_facts import club_data_from_facts, combine_facts, sale_items_not_buffet_from_facts, sales_items_report_from_facts
+from report_queries import DEFAULT_STORE_IDS, PROGRESSIVE_SAMPLE_PCT
+from multi_store import chain_club_summary
+from period_rollup import GRANULARITIES, rollup_engine_for
+from report_views import DEFAULT_GRANULARITY, club_index, club_ranking, items_index, items_ranking
+from detail_table import detail_table
+from artifact_graph import get_artifact_graph
+from instrumentation import finish_run, start_run, summary, timed
+from get_connection import get_pool, get_replica_router
+from report_cache import get_report_cache
+from warmup import start_warmup
+from user_directory import get_user_directory
+
+# Coleta as medições deste rerun para o painel de depuração
+start_run()
+# Worker que mantém o período padrão pronto nos caches (iniciado uma vez por processo)
+start_warmup()
+# Espera após uma troca de datas ou lojas antes de consultar: trocas seguidas interrompem a espera
+DATE_DEBOUNCE_S = float(os.environ.get("CLUB_DATE_DEBOUNCE_S", "0.6"))
+
 # Configuração da página e título
 #st.set_page_config(layout="wide")
 st.title("📊 Ranking de Vendas e CPF Club")
@@ -17,108 +35,264 @@ st.title("📊 Ranking de Vendas e CPF Club")
 today = datetime.date.today()
 start_of_month = today.replace(day=1)
 
+# Modo ao vivo: o período termina hoje e só as vendas novas do dia são buscadas a cada verificação
+live = st.sidebar.toggle(
+    "Ao vivo (hoje)",
+    value=False,
+    key="live",
+    help=f"Verifica vendas novas a cada {LIVE_REFRESH_S:.0f} s e atualiza a página quando houver."
+)
+
 col1, col2 = st.columns(2)
 with col1:
     start_date = st.date_input("Data inicial", value=start_of_month)
 with col2:
-    end_date = st.date_input("Data final", value=today)
+    end_date = st.date_input("Data final", value=today, disabled=live)
+if live:
+    end_date = today
+
+# Lojas do relatório: todas vão na mesma consulta
+if len(DEFAULT_STORE_IDS) > 1:
+    store_ids = st.multiselect("Lojas", DEFAULT_STORE_IDS, default=DEFAULT_STORE_IDS) or list(DEFAULT_STORE_IDS)
+else:
+    store_ids = list(DEFAULT_STORE_IDS)
+
+# Seleção da tela: diferente de st.tabs, só a tela visível é executada
+view = st.segmented_control(
+    "Relatório",
+    list(VIEW_REPORTS),
+    default="CPF Club",
+    key="view",
+    label_visibility="collapsed"
+) or "CPF Club"
+
+show_debug = st.sidebar.toggle("Painel de depuração", value=False)
+
+# Derivados e gráficos memorizados pelo conteúdo dos dados: reruns sem mudança nos dados não os refazem
+graph = get_artifact_graph()
+
+# Debounce: se outra troca chegar durante a espera, o Streamlit interrompe este rerun no próximo
+# comando st.* e nenhuma consulta é disparada para as datas intermediárias. O st.empty() depois
+# do sleep não mostra nada: é esse ponto de verificação (sem ele, a interrupção só aconteceria
+# no próximo comando st.*, depois de as consultas já terem sido disparadas)
+filters = (start_date, end_date, tuple(store_ids))
+if st.session_state.setdefault("report_filters", filters) != filters:
+    st.session_state["report_filters"] = filters
+    time.sleep(DATE_DEBOUNCE_S)
+    st.empty()
 
-# Criação das abas
-tab_cpf_club, tab_vendas_atendente = st.tabs(["CPF Club", "Vendas por Atendente"])
+# Dispara em paralelo todas as consultas da tela visível. No modo ao vivo, as duas telas derivam dos
+# fatos por venda: o histórico até ontem (só ontem expira no cache) mais o delta de hoje, mantido em memória
+facts = None
+if live and start_date:
+    live_day = get_live_day(store_ids)
+    live_day.poll(min_interval=1.0)
+    st.session_state["live_version"] = live_day.version
+    yesterday = today - datetime.timedelta(days=1)
+    history = (
+        load_reports(['sale_facts'], start_date, yesterday, store_ids)['sale_facts'].result()
+        if start_date <= yesterday else None
+    )
+    facts = graph.derive(combine_facts, history, live_day.facts())
+    reports = {}
+else:
+    reports = load_view(view, start_date, end_date, store_ids) if start_date and end_date else {}
 
-with tab_cpf_club:
+# Períodos longos: se as consultas exatas demorarem, uma estimativa por amostragem é mostrada
+# no lugar dos gráficos principais até o resultado exato chegar
+estimate = load_estimate(view, reports, start_date, end_date, store_ids) if reports else None
+ESTIMATE_NOTE = (
+    f"Valores aproximados, estimados por amostragem (~{PROGRESSIVE_SAMPLE_PCT:g}% das vendas, por semana). "
+    "Os resultados exatos substituem estes gráficos assim que a consulta terminar."
+)
+
+if view == "CPF Club":
     if start_date and end_date:
-        df = get_club_data(start_date, end_date)
-        df_w = generate_weekly_df (df)
-        df_t = generate_total_weekly_df(df_w)
+        progress = st.empty()
+        if estimate is not None:
+            df_estimate = graph.derive(club_data_from_facts, estimate)
+            if not df_estimate.empty:
+                ranking_estimate = club_ranking(graph, club_index(df_estimate), start_date, end_date)
+                with progress.container(), timed('render', 'club_estimate'):
+                    st.info(ESTIMATE_NOTE, icon="⏳")
+                    st.subheader("Ranking Final por Vendedor (estimativa)")
+                    st.altair_chart(graph.derive(create_ranking_chart, ranking_estimate), use_container_width=True)
+                    st.subheader("% CPF Club (Acumulado) por Período (estimativa)")
+                    st.altair_chart(graph.derive(create_club_chart, df_estimate), use_container_width=True)
+
+        with st.spinner("Carregando dados de CPF Club..."):
+            if facts is not None:
+                df = graph.derive(club_data_from_facts, facts)
+            else:
+                df = reports['club_data'].result()
+        progress.empty()
         if not df.empty:
+            if len(store_ids) > 1:
+                st.subheader("Visão da Rede")
+                st.dataframe(graph.derive(chain_club_summary, df), hide_index=True)
+
+            # Somas prefixadas por vendedor: recortes e comparações dentro do período carregado sem ir ao banco
+            df_index = club_index(df)
+
             st.subheader("Ranking Final por Vendedor")
-            ranking_chart = create_ranking_chart(df)
-            
-            st.altair_chart(ranking_chart, use_container_width=True)
+            ranking_range = st.slider(
+                "Recorte do ranking",
+                min_value=start_date,
+                max_value=end_date,
+                value=(start_date, end_date),
+                format="DD/MM/YYYY",
+                key="club_ranking_range"
+            ) if start_date < end_date else (start_date, end_date)
+            ranking = club_ranking(graph, df_index, *ranking_range)
+            ranking_chart = graph.derive(create_ranking_chart, ranking)
+            with timed('render', 'ranking_chart'):
+                st.altair_chart(ranking_chart, use_container_width=True)
 
             st.subheader("% CPF Club (Acumulado) por Período")
-            final_chart = create_club_chart(df)
-            st.altair_chart(final_chart, use_container_width=True)
+            final_chart = graph.derive(create_club_chart, df)
+            with timed('render', 'club_chart'):
+                st.altair_chart(final_chart, use_container_width=True)
             
-            st.subheader("Semanal Total")
+            with st.expander("Comparar períodos"):
+                col_a, col_b = st.columns(2)
+                with col_a:
+                    period_a = st.date_input(
+                        "Período A", value=(start_date, start_date), min_value=start_date, max_value=end_date,
+                        key="club_period_a"
+                    )
+                with col_b:
+                    period_b = st.date_input(
+                        "Período B", value=(end_date, end_date), min_value=start_date, max_value=end_date,
+                        key="club_period_b"
+                    )
+                # O seletor devolve uma só data enquanto o intervalo está sendo escolhido
+                if len(period_a) == 2 and len(period_b) == 2:
+                    st.dataframe(
+                        graph.derive(
+                            df_index.compare,
+                            period_a, period_b, 'Qtd. CPF Clube (Dia)', 'Vendas Totais (Dia)', by=['Vendedor']
+                        ),
+                        hide_index=True
+                    )
+
+            # Consolidação por período: trocar a granularidade reaproveita o mesmo motor
+            granularity = st.segmented_control(
+                "Consolidar por",
+                list(GRANULARITIES),
+                default=DEFAULT_GRANULARITY,
+                key="granularity"
+            ) or DEFAULT_GRANULARITY
+            with timed('pandas', 'period_rollup'):
+                df_w, df_t = rollup_engine_for(df).rollup(GRANULARITIES[granularity])
+
+            st.subheader(f"Total por {granularity}")
             st.dataframe(df_t, hide_index=True)
-            st.subheader("Semanal por Atendente")
+            st.subheader(f"Por Atendente e {granularity}")
             st.dataframe(df_w, hide_index=True)
             
             st.subheader("Dados dia a dia")
-            st.data_editor(
-                df,
-                column_config={
-                    "Vendedor": st.column_config.Column(
-                        label="Vendedor",
-                        disabled=False, 
-                        help="Selecione o vendedor para filtrar"
-                    )
-                },
-                hide_index=True,
-                disabled=True
-            )
+            with timed('render', 'club_data_table'):
+                detail_table(df, key="club_detail", filter_column="Vendedor", export_name="cpf_club_dia_a_dia")
         else:
             st.warning("Nenhum dado de CPF Club encontrado para o período selecionado.")
 
-with tab_vendas_atendente:
+if view == "Vendas por Atendente":
     if start_date and end_date:
-        data, df_total = read_sales_items_report_by_user(start_date, end_date)
+        progress = st.empty()
+        if estimate is not None:
+            data_estimate, _ = graph.derive(sales_items_report_from_facts, estimate)
+            if not data_estimate.empty:
+                ranking_estimate = items_ranking(graph, items_index(data_estimate), start_date, end_date)
+                with progress.container(), timed('render', 'sales_estimate'):
+                    st.info(ESTIMATE_NOTE, icon="⏳")
+                    st.subheader("Ranking de Vendas de Itens por Atendente (estimativa)")
+                    st.altair_chart(graph.derive(create_items_ranking_chart, ranking_estimate), use_container_width=True)
+                    st.subheader("% Venda Itens Acumulado por periodo (estimativa)")
+                    st.altair_chart(graph.derive(create_sales_chart_by_user, data_estimate), use_container_width=True)
+
+        # Relatório por atendente e itens derivam dos mesmos fatos por venda, ou vêm dos agregados
+        with st.spinner("Carregando vendas por atendente..."):
+            if 'sale_facts' in reports:
+                facts = reports['sale_facts'].result()
+            if facts is not None:
+                with timed('pandas', 'sales_items_report_from_facts'):
+                    data, df_total = graph.derive(sales_items_report_from_facts, facts)
+            else:
+                data, df_total = reports['sales_items_by_user'].result()
+        progress.empty()
 
         if not data.empty:
             st.subheader("Ranking de Vendas de Itens por Atendente")
-            
-            
-            
-                        # Cria a camada de barras
-            # Garantir que o campo é numérico e ajustar escala
-            df_total['% Venda Itens Acumulado'] = pd.to_numeric(
-                df_total['% Venda Itens Acumulado'], errors='coerce'
-            ) / 100
-            #print(df_total)
-            max_val = df_total['% Venda Itens Acumulado'].max()* 1.1 
-
-            base_chart = alt.Chart(df_total).encode(
-                y=alt.Y('Atendente', sort='-x', title='Vendedor'),
-                x=alt.X(
-                    '% Venda Itens Acumulado',
-                    scale=alt.Scale(domain=[0, max_val]),  # Sempre de 0 até 100%
-                    axis=alt.Axis(format='.2%')
-                ),
-                tooltip=[
-                    'Atendente',
-                    alt.Tooltip('% Venda Itens Acumulado:Q', format='.2%', title='Percentual')
-                ],
-                color=alt.Color('Atendente', legend=None)
-            )
-
-            bar_chart = base_chart.mark_bar()
-
-            text_chart = base_chart.mark_text(
-                align='left',
-                baseline='middle',
-                dx=3
-            ).encode(
-                text=alt.Text('% Venda Itens Acumulado', format='.2%')
-            )
-
-            final_chart = (bar_chart + text_chart).interactive()
-
-            st.altair_chart(final_chart, use_container_width=True)
-
-            chart_tt = create_sales_chart_by_user(data)
+
+            # Ranking do recorte escolhido, pelas somas prefixadas por atendente (sem nova consulta)
+            data_index = items_index(data)
+            items_range = st.slider(
+                "Recorte do ranking",
+                min_value=start_date,
+                max_value=end_date,
+                value=(start_date, end_date),
+                format="DD/MM/YYYY",
+                key="items_ranking_range"
+            ) if start_date < end_date else (start_date, end_date)
+            df_total = items_ranking(graph, data_index, *items_range)
+
+            final_chart = graph.derive(create_items_ranking_chart, df_total)
+
+            with timed('render', 'sales_ranking_chart'):
+                st.altair_chart(final_chart, use_container_width=True)
+
+            chart_tt = graph.derive(create_sales_chart_by_user, data)
             st.subheader("% Venda Itens Acumulado por periodo")
 
-            st.altair_chart(chart_tt, use_container_width=True)
+            with timed('render', 'sales_chart_by_user'):
+                st.altair_chart(chart_tt, use_container_width=True)
             
             st.subheader("Items por periodo")
 
-            df_si =read_sale_items_not_buffet(start_date, end_date)
-            chart_si = create_sale_items_chart(df_si)
-            st.altair_chart(chart_si, use_container_width=True)
+            if facts is not None:
+                with timed('pandas', 'sale_items_not_buffet_from_facts'):
+                    df_si = graph.derive(sale_items_not_buffet_from_facts, facts)
+            else:
+                with st.spinner("Carregando itens..."):
+                    df_si = reports['sale_items_not_buffet'].result()
+            chart_si = graph.derive(create_sale_items_chart, df_si)
+            with timed('render', 'sale_items_chart'):
+                st.altair_chart(chart_si, use_container_width=True)
 
             st.subheader("Dados Detalhados por Atendente")
-            st.dataframe(data)
+            with timed('render', 'sales_items_table'):
+                detail_table(data, key="items_detail", filter_column="Atendente", export_name="vendas_por_atendente")
         else:
-            st.warning("Nenhum dado de vendas por atendente encontrado para o período selecionado.")
\ No newline at end of file
+            st.warning("Nenhum dado de vendas por atendente encontrado para o período selecionado.")
+
+# No modo ao vivo, só este fragmento roda a cada intervalo: uma consulta pequena pelas vendas novas,
+# e a página inteira é refeita apenas quando o dia mudou (inclusive por verificação de outra sessão)
+if live:
+    @st.fragment(run_every=LIVE_REFRESH_S)
+    def live_refresh():
+        live_day = get_live_day(store_ids)
+        live_day.poll(min_interval=LIVE_REFRESH_S / 2)
+        if live_day.version != st.session_state.get("live_version"):
+            st.rerun()
+        st.caption(f"Ao vivo · última verificação às {datetime.datetime.now():%H:%M:%S}")
+
+    live_refresh()
+
+# Medições do rerun; o arquivo do Prometheus (CLUB_METRICS_TEXTFILE) é atualizado mesmo sem o painel
+run_metrics = finish_run()
+if show_debug:
+    with st.sidebar:
+        st.subheader("Este rerun")
+        st.dataframe(run_metrics, hide_index=True)
+        st.subheader("Histórico (p50/p95)")
+        st.dataframe(summary(), hide_index=True)
+        st.subheader("Pool de conexões")
+        st.json(get_pool().stats())
+        st.subheader("Roteamento de leitura")
+        st.json(get_replica_router().stats())
+        st.subheader("Cache de relatórios")
+        st.json(get_report_cache().stats())
+        st.subheader("Artefatos memorizados")
+        st.json(graph.stats())
+        st.subheader("Cadastro de usuários")
+        st.json(get_user_directory().stats())
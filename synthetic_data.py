@@ -0,0 +1,158 @@
+import argparse
+import datetime
+from get_connection import get_connection
+from settings import get_setting
+
+# Hosts aceitos sem --allow-remote: o gerador apaga e recria as tabelas de vendas
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", ""}
+
+# Esquema mínimo usado pelas consultas dos relatórios (as tabelas reais têm mais colunas)
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS USER_THE_BEST (
+        ID BIGINT PRIMARY KEY,
+        NAME TEXT
+    );
+    CREATE TABLE IF NOT EXISTS CASH_HISTORY (
+        ID BIGINT PRIMARY KEY,
+        STORE_ID BIGINT NOT NULL,
+        OPENED_BY BIGINT
+    );
+    CREATE TABLE IF NOT EXISTS SALES (
+        ID BIGINT PRIMARY KEY,
+        CASH_HISTORY_ID BIGINT NOT NULL,
+        CREATED_AT TIMESTAMP NOT NULL,
+        CLIENT_CPF TEXT,
+        ABSTRACT_SALE BOOLEAN NOT NULL DEFAULT FALSE,
+        TYPE INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS SALE_ITEMS (
+        ID BIGINT PRIMARY KEY,
+        SALE_ID BIGINT NOT NULL,
+        NAME TEXT NOT NULL
+    );
+    TRUNCATE SALE_ITEMS, SALES, CASH_HISTORY, USER_THE_BEST;
+"""
+
+_USERS = """
+    INSERT INTO USER_THE_BEST (ID, NAME)
+    SELECT u, 'vendedor_' || u FROM generate_series(1, %s) u
+"""
+
+# Uma sessão de caixa por (loja, vendedor, dia); cada vendedor trabalha em uma única loja
+_CASH_SESSIONS = """
+    CREATE TEMP TABLE gen_caixas ON COMMIT DROP AS
+    SELECT
+        ROW_NUMBER() OVER (ORDER BY d, s.n, u) AS id,
+        s.store_id,
+        u AS opened_by,
+        %s::date + d AS dia
+    FROM unnest(%s::bigint[]) WITH ORDINALITY AS s(store_id, n)
+    CROSS JOIN generate_series(1, %s) u
+    CROSS JOIN generate_series(0, %s - 1) d
+    WHERE (u - 1) %% cardinality(%s::bigint[]) = s.n - 1;
+
+    INSERT INTO CASH_HISTORY (ID, STORE_ID, OPENED_BY)
+    SELECT id, store_id, opened_by FROM gen_caixas;
+"""
+
+# Vendas entre 8h e 22h; `c.id * 0` força um sorteio de quantidade por sessão de caixa
+_SALES = """
+    INSERT INTO SALES (ID, CASH_HISTORY_ID, CREATED_AT, CLIENT_CPF, ABSTRACT_SALE, TYPE)
+    SELECT
+        ROW_NUMBER() OVER (ORDER BY c.id, n),
+        c.id,
+        c.dia + TIME '08:00' + random() * INTERVAL '14 hours',
+        CASE WHEN random() < %s THEN lpad((random() * 1e11)::bigint::text, 11, '0') END,
+        random() < 0.02,
+        CASE WHEN random() < 0.97 THEN 0 ELSE 1 END
+    FROM gen_caixas c
+    CROSS JOIN LATERAL generate_series(1, (%s * (0.5 + random()) + c.id * 0)::int) AS n
+"""
+
+# Itens com popularidade assimétrica: floor(catálogo ^ random()) concentra as vendas nos primeiros
+_SALE_ITEMS = """
+    INSERT INTO SALE_ITEMS (ID, SALE_ID, NAME)
+    SELECT
+        ROW_NUMBER() OVER (ORDER BY S.ID, n),
+        S.ID,
+        CASE
+            WHEN random() < %s THEN 'self-service'
+            ELSE 'item_' || lpad(floor(power(%s, random()))::int::text, 4, '0')
+        END
+    FROM SALES S
+    CROSS JOIN LATERAL generate_series(1, (random() * 2 * %s + S.ID * 0)::int) AS n
+"""
+
+
+def generate(store_ids, sellers, days, sales_per_day, items_per_sale, catalog_size,
+             cpf_rate=0.35, buffet_rate=0.5, end_date=None, seed=0.42):
+    """
+    Recria as tabelas de vendas com dados sintéticos reprodutíveis (mesma semente, mesmos dados).
+
+    Args:
+        store_ids (list[int]): Lojas geradas.
+        sellers (int): Vendedores no total, distribuídos entre as lojas.
+        days (int): Dias de histórico, terminando em `end_date`.
+        sales_per_day (int): Média de vendas por vendedor e dia.
+        items_per_sale (float): Média de itens por venda.
+        catalog_size (int): Itens distintos no cardápio (além do 'self-service').
+        cpf_rate (float): Fração das vendas com CPF informado.
+        buffet_rate (float): Fração dos itens que são 'self-service'.
+        end_date (datetime.date): Último dia gerado (padrão: ontem).
+        seed (float): Semente do random() do Postgres, entre -1 e 1.
+
+    Returns:
+        dict: Linhas geradas por tabela.
+    """
+    end_date = end_date or datetime.date.today() - datetime.timedelta(days=1)
+    start_date = end_date - datetime.timedelta(days=days - 1)
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            # Sem paralelismo, para que a mesma semente gere sempre os mesmos dados
+            cursor.execute("SET LOCAL max_parallel_workers_per_gather = 0")
+            cursor.execute("SET LOCAL statement_timeout = 0")
+            cursor.execute("SELECT setseed(%s)", (seed,))
+            cursor.execute(SCHEMA)
+            cursor.execute(_USERS, (sellers,))
+            cursor.execute(_CASH_SESSIONS, (start_date, list(store_ids), sellers, days, list(store_ids)))
+            cursor.execute(_SALES, (cpf_rate, sales_per_day))
+            cursor.execute(_SALE_ITEMS, (buffet_rate, catalog_size, items_per_sale))
+
+            counts = {}
+            for table in ("USER_THE_BEST", "CASH_HISTORY", "SALES", "SALE_ITEMS"):
+                cursor.execute(f"SELECT COUNT(1) AS n FROM {table}")
+                counts[table] = cursor.fetchone()['n']
+    # ANALYZE fora da transação da carga, para o planejador ver as novas estatísticas
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = 0")
+            cursor.execute("ANALYZE USER_THE_BEST, CASH_HISTORY, SALES, SALE_ITEMS")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preenche um Postgres local com vendas sintéticas para os benchmarks.")
+    parser.add_argument("--stores", type=lambda value: [int(store) for store in value.split(",")], default=[467], help="Lojas separadas por vírgula.")
+    parser.add_argument("--sellers", type=int, default=8, help="Vendedores no total.")
+    parser.add_argument("--days", type=int, default=365, help="Dias de histórico, terminando ontem.")
+    parser.add_argument("--sales-per-day", type=int, default=40, help="Média de vendas por vendedor e dia.")
+    parser.add_argument("--items-per-sale", type=float, default=2.0, help="Média de itens por venda.")
+    parser.add_argument("--catalog-size", type=int, default=200, help="Itens distintos no cardápio.")
+    parser.add_argument("--seed", type=float, default=0.42, help="Semente, entre -1 e 1.")
+    parser.add_argument("--allow-remote", action="store_true", help="Permite gerar em um servidor que não seja local.")
+    args = parser.parse_args()
+
+    host = str(get_setting("host", ""))
+    if host not in LOCAL_HOSTS and not host.startswith("/") and not args.allow_remote:
+        parser.error(f"host '{host}' não é local: as tabelas de vendas seriam apagadas (use --allow-remote)")
+
+    counts = generate(
+        args.stores, args.sellers, args.days, args.sales_per_day,
+        args.items_per_sale, args.catalog_size, seed=args.seed,
+    )
+    for table, n in counts.items():
+        print(f"{table}: {n} linha(s)")
+
+
+if __name__ == "__main__":
+    main()
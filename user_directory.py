@@ -0,0 +1,173 @@
+import os
+import time
+import threading
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from get_connection import get_report_connection
+from fetch_frame import fetch_frame
+from report_queries import report_filters
+
+# Intervalo, em segundos, entre as verificações de mudança no cadastro de usuários
+USER_DIRECTORY_TTL_S = float(os.environ.get("CLUB_USER_DIRECTORY_TTL_S", "300"))
+
+# Intervalo mínimo entre recargas forçadas por um id desconhecido (ex.: vendedor sem cadastro)
+_FORCED_REFRESH_MIN_S = 10.0
+
+# Versão do cadastro: muda quando algum usuário é criado, removido ou renomeado
+_USERS_VERSION_QUERY = """
+    SELECT md5(COALESCE(string_agg(ID::text || ':' || COALESCE(NAME, ''), ',' ORDER BY ID), '')) AS version
+    FROM USER_THE_BEST
+"""
+
+_USERS_QUERY = "SELECT ID AS id, NAME AS name FROM USER_THE_BEST WHERE NAME IS NOT NULL"
+
+# Arrays de busca de uma versão do cadastro, trocados juntos (ver UserDirectory._load)
+_Snapshot = namedtuple('_Snapshot', ['ids', 'codes', 'names', 'labels'])
+
+_EMPTY_SNAPSHOT = _Snapshot(
+    np.array([], dtype='int64'),
+    np.array([], dtype='int64'),
+    pd.Series(dtype='object'),
+    pd.Index([], dtype='object'),
+)
+
+
+class UserDirectory:
+    """
+    Dimensão de usuários (id -> nome, de USER_THE_BEST) mantida em memória no processo.
+
+    As consultas de relatório devolvem apenas CH.OPENED_BY e os nomes são anexados aqui,
+    como categorias: cada id tem um rótulo único (nomes repetidos ganham o id entre
+    parênteses), de modo que agrupar pelo rótulo equivale a agrupar pelo id. A cada
+    `ttl_s` segundos a versão do cadastro é conferida e, se mudou, a dimensão é recarregada.
+    """
+
+    def __init__(self, ttl_s=USER_DIRECTORY_TTL_S):
+        self.ttl_s = ttl_s
+        self.version = None
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._checked_at = -float('inf')
+        self._snapshot = _EMPTY_SNAPSHOT
+
+    def _load(self, users):
+        """
+        Monta os arrays de busca a partir de (id, nome): ids ordenados para `searchsorted`
+        e, para cada um, o código do seu rótulo nas categorias (em ordem alfabética).
+
+        Os arrays são publicados numa única atribuição: quem lê sem o lock (labels, ids_for)
+        pega o snapshot uma vez e nunca mistura ids novos com códigos antigos.
+        """
+        users = users.sort_values('id').reset_index(drop=True)
+        shared = users['name'].duplicated(keep=False)
+        labels = users['name'].where(~shared, users['name'] + ' (' + users['id'].astype(str) + ')')
+        codes, categories = pd.factorize(labels, sort=True)
+        ids = users['id'].to_numpy(dtype='int64')
+        self._snapshot = _Snapshot(
+            ids,
+            codes.astype('int64'),
+            pd.Series(users['name'].to_numpy(), index=ids),
+            pd.Index(categories),
+        )
+
+    def refresh(self, force=False):
+        """
+        Confere a versão do cadastro e recarrega a dimensão se ela mudou.
+
+        Args:
+            force (bool): Confere mesmo antes de `ttl_s` (respeitando um intervalo mínimo).
+        """
+        min_age = _FORCED_REFRESH_MIN_S if force else self.ttl_s
+        with self._lock:
+            if time.monotonic() - self._checked_at < min_age:
+                return
+            with get_report_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(_USERS_VERSION_QUERY)
+                    version = cursor.fetchone()['version']
+                if version != self.version:
+                    users = fetch_frame(conn, _USERS_QUERY, (), {'id': 'int64', 'name': 'object'})
+                    self._load(users)
+                    self.version = version
+                    self.generation += 1
+            self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _positions(snapshot, ids):
+        ids = np.asarray(ids, dtype='int64')
+        known = snapshot.ids
+        positions = np.searchsorted(known, ids)
+        positions = np.minimum(positions, max(len(known) - 1, 0))
+        found = (positions < len(known)) & (known[positions] == ids) if len(known) else np.zeros(len(ids), bool)
+        return positions, found
+
+    def labels(self, ids) -> pd.Categorical:
+        """
+        Rótulos dos usuários, como categorias; ids sem cadastro (ou sem nome) viram NaN.
+
+        Args:
+            ids (array-like[int]): Ids de usuário (ex.: a coluna opened_by).
+
+        Returns:
+            pd.Categorical: Um rótulo por id, apenas com as categorias presentes.
+        """
+        self.refresh()
+        snapshot = self._snapshot
+        positions, found = self._positions(snapshot, ids)
+        if not found.all():
+            self.refresh(force=True)
+            snapshot = self._snapshot
+            positions, found = self._positions(snapshot, ids)
+        codes = np.where(found, snapshot.codes[positions] if len(snapshot.codes) else -1, -1)
+        return pd.Categorical.from_codes(codes, categories=snapshot.labels).remove_unused_categories()
+
+    def ids_for(self, names):
+        """
+        Ids dos usuários com os nomes (ou rótulos) informados, para filtros `<> ALL(%s)`.
+        """
+        self.refresh()
+        snapshot = self._snapshot
+        names = set(names)
+        labels = snapshot.labels[snapshot.codes] if len(snapshot.codes) else pd.Index([])
+        mask = snapshot.names.isin(names).to_numpy() | labels.isin(names)
+        return snapshot.ids[mask].tolist()
+
+    def stats(self):
+        return {
+            'users': len(self._snapshot.ids),
+            'generation': self.generation,
+            'version': self.version,
+        }
+
+
+_user_directory = UserDirectory()
+
+
+def get_user_directory():
+    return _user_directory
+
+
+def excluded_seller_ids(excluded_sellers=None):
+    """
+    Converte os vendedores excluídos (por nome, como em report_filters) nos seus ids.
+    """
+    _, excluded_sellers = report_filters(excluded_sellers=excluded_sellers)
+    return _user_directory.ids_for(excluded_sellers)
+
+
+def attach_seller_names(df, column, id_column='opened_by', drop_ids=True):
+    """
+    Anexa a `df` a coluna `column` com os rótulos dos vendedores de `id_column` e descarta
+    as linhas de vendedores sem cadastro (mesma semântica do antigo INNER JOIN com USER_THE_BEST).
+
+    Returns:
+        pd.DataFrame: Novo DataFrame, com `column` na posição de `id_column`.
+    """
+    position = df.columns.get_loc(id_column)
+    df = df.copy()
+    df.insert(position, column, _user_directory.labels(df[id_column].to_numpy()))
+    df = df[df[column].notna()]
+    if drop_ids:
+        df = df.drop(columns=id_column)
+    return df.reset_index(drop=True)
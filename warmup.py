@@ -0,0 +1,130 @@
+import os
+import time
+import logging
+import datetime
+import threading
+import streamlit as st
+from report_loader import REPORTS, VIEW_REPORTS
+from report_queries import DEFAULT_STORE_IDS
+from sale_facts import sale_items_not_buffet_from_facts, sales_items_report_from_facts
+from multi_store import chain_club_summary
+from period_rollup import GRANULARITIES, rollup_engine_for
+from report_views import DEFAULT_GRANULARITY, club_index, club_ranking, items_index, items_ranking
+from artifact_graph import get_artifact_graph
+from create_club_chart import create_club_chart, create_ranking_chart
+from create_sales_chart_by_user import create_items_ranking_chart, create_sales_chart_by_user
+from create_sale_items_chart import create_sale_items_chart
+from instrumentation import report_span, timed
+
+# Intervalo, em segundos, entre os aquecimentos do período padrão (0 desliga o aquecimento no app).
+# Os dias encerrados ficam no cache sem expirar (ver read_sale_facts_split): depois da primeira
+# passada do dia, cada uma relê só ontem e hoje. O intervalo serve para levar a virada do dia
+# (quando ontem passa a ser um dia encerrado) ao cache antes da primeira visita
+WARMUP_INTERVAL_S = float(os.environ.get("CLUB_WARMUP_INTERVAL_S", "1800"))
+
+logger = logging.getLogger("club.warmup")
+
+
+def default_range(today=None):
+    """
+    Período aberto pelo app sem interação: do primeiro dia do mês até hoje.
+    """
+    today = today or datetime.date.today()
+    return today.replace(day=1), today
+
+
+def _warm_club_view(graph, df, start_date, end_date, store_ids):
+    """
+    Mesmos derivados e gráficos da tela de CPF Club no estado inicial.
+    """
+    if df.empty:
+        return
+    if len(store_ids) > 1:
+        graph.derive(chain_club_summary, df)
+    ranking = club_ranking(graph, club_index(df), start_date, end_date)
+    graph.derive(create_ranking_chart, ranking)
+    graph.derive(create_club_chart, df)
+    rollup_engine_for(df).rollup(GRANULARITIES[DEFAULT_GRANULARITY])
+
+
+def _warm_sales_view(graph, data, df_si, start_date, end_date):
+    """
+    Mesmos derivados e gráficos da tela de vendas por atendente no estado inicial.
+    """
+    if data.empty:
+        return
+    df_total = items_ranking(graph, items_index(data), start_date, end_date)
+    graph.derive(create_items_ranking_chart, df_total)
+    graph.derive(create_sales_chart_by_user, data)
+    graph.derive(create_sale_items_chart, df_si)
+
+
+def warm_default_range(today=None, store_ids=None):
+    """
+    Carrega no cache de relatórios as consultas de todas as telas para o período padrão e as
+    lojas configuradas, e monta os derivados e gráficos iniciais no grafo de artefatos. Como
+    são os mesmos caches usados pelas sessões, a primeira visita encontra tudo pronto.
+
+    Args:
+        today (datetime.date): Dia de referência (padrão: hoje).
+        store_ids (list[int]): Lojas (padrão: DEFAULT_STORE_IDS, como no app).
+
+    Returns:
+        dict[str, float]: Duração, em segundos, do aquecimento de cada consulta.
+    """
+    start_date, end_date = default_range(today)
+    store_ids = list(DEFAULT_STORE_IDS) if store_ids is None else list(store_ids)
+    graph = get_artifact_graph()
+
+    durations = {}
+    results = {}
+    for name in dict.fromkeys(name for names in VIEW_REPORTS.values() for name in names):
+        started = time.perf_counter()
+        with report_span(name):
+            results[name] = REPORTS[name](start_date, end_date, store_ids)
+        durations[name] = time.perf_counter() - started
+
+    with timed('pandas', 'warmup_artifacts'):
+        _warm_club_view(graph, results['club_data'], start_date, end_date, store_ids)
+        if 'sale_facts' in results:
+            data, _ = graph.derive(sales_items_report_from_facts, results['sale_facts'])
+            df_si = graph.derive(sale_items_not_buffet_from_facts, results['sale_facts'])
+        else:
+            data, _ = results['sales_items_by_user']
+            df_si = results['sale_items_not_buffet']
+        _warm_sales_view(graph, data, df_si, start_date, end_date)
+    return durations
+
+
+def _warmup_loop(interval_s):
+    while True:
+        try:
+            durations = warm_default_range()
+            logger.info("Aquecimento concluído: %s", {name: round(d, 3) for name, d in durations.items()})
+        except Exception:
+            # Uma falha (ex.: banco fora do ar) não derruba o worker; tenta de novo no próximo ciclo
+            logger.exception("Falha no aquecimento do período padrão")
+        time.sleep(interval_s)
+
+
+@st.cache_resource
+def start_warmup():
+    """
+    Inicia, uma única vez por processo do servidor, o worker que aquece o período padrão
+    e o repete a cada WARMUP_INTERVAL_S segundos.
+
+    Returns:
+        threading.Thread | None: O worker, ou None com o aquecimento desligado.
+    """
+    if WARMUP_INTERVAL_S <= 0:
+        return None
+    thread = threading.Thread(target=_warmup_loop, args=(WARMUP_INTERVAL_S,), name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    # Um aquecimento avulso (ex.: depois de um deploy): preenche o armazenamento diário local,
+    # o cadastro de usuários e os caches do banco; os caches em memória são os deste processo
+    for name, duration in warm_default_range().items():
+        print(f"{name}: {duration:.2f} s")